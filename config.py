@@ -14,9 +14,29 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 FONT_API_URL = "https://font.download/ajax/autocomplete"
 FONT_DOWNLOAD_URL = "https://font.download/dl/font/{slug}.zip"
 
+# Максимальное количество подсказок, которое возвращает API автодополнения
+FONT_API_SUGGESTIONS_LIMIT = int(os.getenv("FONT_API_SUGGESTIONS_LIMIT", "10"))
+
 # Количество шрифтов на странице
 FONTS_PER_PAGE = 3
 
+# Кеш результатов поиска по ID поиска: количество поисков и время простоя до вытеснения в секундах
+RESULT_STORE_SIZE = int(os.getenv("RESULT_STORE_SIZE", "1000"))
+RESULT_STORE_IDLE_TTL = int(os.getenv("RESULT_STORE_IDLE_TTL", str(30 * 60)))
+
+# Количество записей истории поиска на странице
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "10"))
+
+# Количество записей на странице списков пользователей и поисков в админ-панели
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "5"))
+
+# Кеш шрифтов и пользователей, запрашиваемых по ID: размер и время жизни записей в секундах
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "512"))
+ENTITY_CACHE_TTL = int(os.getenv("ENTITY_CACHE_TTL", "300"))
+
+# Время жизни закешированной сводной статистики админ-панели в секундах
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "10"))
+
 # Директории
 LOGS_DIR = os.path.join(BASE_DIR, "logs")
 FONTS_DIR = os.path.join(BASE_DIR, "fonts")
@@ -35,4 +55,60 @@ LOG_FILE = os.path.join(LOGS_DIR, "bot.log")
 SEARCH_LOG_FILE = os.path.join(LOGS_DIR, "search.log")
 
 # ID администраторов бота (список)
-ADMIN_IDS = [int(id) for id in os.getenv("ADMIN_IDS", "").split(",") if id] 
\ No newline at end of file
+ADMIN_IDS = [int(id) for id in os.getenv("ADMIN_IDS", "").split(",") if id]
+
+# Настройки HTTP-клиента (общий пул соединений к font.download)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+
+# Кеш результатов автодополнения (LRU в памяти + таблица SQLite)
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(6 * 60 * 60)))
+# Как часто (в секундах) из таблицы удаляются устаревшие записи
+SEARCH_CACHE_PURGE_INTERVAL = int(os.getenv("SEARCH_CACHE_PURGE_INTERVAL", str(10 * 60)))
+# Минимальная длина префикса, результаты которого используются для уточняющих запросов
+SEARCH_PREFIX_MIN_LENGTH = int(os.getenv("SEARCH_PREFIX_MIN_LENGTH", "2"))
+
+# Скачивание архивов шрифтов
+# (50 МБ - ограничение Telegram на отправку файлов ботом)
+FONT_MAX_DOWNLOAD_SIZE = int(os.getenv("FONT_MAX_DOWNLOAD_SIZE", str(50 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(64 * 1024)))
+DOWNLOAD_PROGRESS_INTERVAL = float(os.getenv("DOWNLOAD_PROGRESS_INTERVAL", "2"))
+
+# Очередь скачиваний шрифтов
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+DOWNLOAD_QUEUE_SIZE = int(os.getenv("DOWNLOAD_QUEUE_SIZE", "100"))
+DOWNLOAD_USER_LIMIT = int(os.getenv("DOWNLOAD_USER_LIMIT", "2"))
+
+# Соединения с SQLite (одно соединение на запись + пул соединений на чтение)
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", str(16 * 1024)))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "5"))
+
+# Отложенная запись аналитики (пользователи, скачивания, локальные поиски)
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "200"))
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "5"))
+ANALYTICS_MAX_PENDING = int(os.getenv("ANALYTICS_MAX_PENDING", "5000"))
+# Максимальная пауза в секундах между повторными попытками записи после ошибок
+ANALYTICS_MAX_BACKOFF = float(os.getenv("ANALYTICS_MAX_BACKOFF", "60"))
+
+# Количество пользователей, чьи данные запоминаются, чтобы не перезаписывать их при каждом обновлении
+SEEN_USERS_CACHE_SIZE = int(os.getenv("SEEN_USERS_CACHE_SIZE", "10000"))
+
+# Хранилище состояний FSM в SQLite: время жизни неизменявшегося состояния и интервал очистки в секундах,
+# размер кеша в памяти, интервал и размер пачки отложенной записи
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", str(24 * 60 * 60)))
+FSM_SWEEP_INTERVAL = int(os.getenv("FSM_SWEEP_INTERVAL", str(10 * 60)))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "1"))
+FSM_BATCH_SIZE = int(os.getenv("FSM_BATCH_SIZE", "200"))
+
+# Нечеткий поиск по локальной базе (триграммный индекс названий)
+FUZZY_MIN_SIMILARITY = float(os.getenv("FUZZY_MIN_SIMILARITY", "0.3"))
+FUZZY_RESULTS_LIMIT = int(os.getenv("FUZZY_RESULTS_LIMIT", "10"))
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    ANALYTICS_BATCH_SIZE, ANALYTICS_FLUSH_INTERVAL, ANALYTICS_MAX_PENDING, ANALYTICS_MAX_BACKOFF, SEEN_USERS_CACHE_SIZE
+)
+from utils.lru_cache import LRUCache
+
+
+class AnalyticsWriter:
+    """
+    Отложенная запись аналитических событий: данные пользователей, счетчики скачиваний
+    и логи локального поиска копятся в памяти и записываются пачками одной транзакцией
+    по достижении размера пачки или по таймеру. После ошибки записи повторные попытки
+    откладываются с нарастающей паузой, а каждый буфер ограничен max_pending событиями.
+    """
+
+    def __init__(self, batch_size: int = ANALYTICS_BATCH_SIZE,
+                 flush_interval: float = ANALYTICS_FLUSH_INTERVAL,
+                 max_pending: int = ANALYTICS_MAX_PENDING,
+                 max_backoff: float = ANALYTICS_MAX_BACKOFF,
+                 seen_users_size: int = SEEN_USERS_CACHE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self._db = None
+        self._users: Dict[int, Tuple[int, str, str]] = {}
+        self._downloads: Counter = Counter()
+        self._local_searches: List[Tuple[int, str, int, str]] = []
+        # Последние известные данные пользователей: user_id -> (username, full_name)
+        self._seen_users = LRUCache(maxsize=seen_users_size)
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Подряд идущие ошибки записи и время, раньше которого запись не повторяется
+        self._failures = 0
+        self._retry_at = 0.0
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.user_writes = 0
+        self.user_skips = 0
+
+    def bind(self, db) -> None:
+        """Подключение асинхронной базы данных"""
+        self._db = db
+
+    @property
+    def pending(self) -> int:
+        return len(self._users) + len(self._downloads) + len(self._local_searches)
+
+    async def start(self) -> None:
+        """Запуск фоновой записи (вызывается при запуске диспетчера)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="analytics-writer")
+
+    async def stop(self) -> None:
+        """Остановка фоновой записи с записью оставшихся событий"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush(force=True)
+
+    async def add_user(self, user_id: int, username: str, full_name: str) -> None:
+        """
+        Сохранение данных пользователя. Запись ставится в очередь, только если пользователь
+        новый или изменились его имя или username; повторные события схлопываются.
+        """
+        profile = (username, full_name)
+        if self._seen_users.get(user_id) == profile:
+            self.user_skips += 1
+            return
+        
+        self._seen_users.set(user_id, profile)
+        self.user_writes += 1
+        self._users[user_id] = (user_id, username, full_name)
+        await self._after_add()
+
+    async def increment_font_download_count(self, font_id: int) -> None:
+        """Увеличение счетчика загрузок шрифта"""
+        self._downloads[font_id] += 1
+        await self._after_add()
+
+    async def log_local_search(self, user_id: int, query: str, results_count: int) -> None:
+        """Логирование поиска в локальной базе"""
+        search_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._local_searches.append((user_id, query, results_count, search_date))
+        await self._after_add()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики отложенной записи для админ-панели"""
+        return {
+            "pending": self.pending,
+            "flushed": self.flushed,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "user_writes": self.user_writes,
+            "user_skips": self.user_skips,
+            "seen_users": len(self._seen_users)
+        }
+
+    @property
+    def _backing_off(self) -> bool:
+        return time.monotonic() < self._retry_at
+
+    async def _after_add(self) -> None:
+        if self.pending >= self.max_pending:
+            if self._backing_off:
+                # База недоступна: не ждем заведомо неудачной записи, а отбрасываем старые события
+                self._trim()
+            else:
+                # Буфер переполнен: ждем записи, а не копим события дальше
+                await self.flush()
+        elif self.pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _trim(self) -> None:
+        """Ограничение каждого буфера max_pending событиями (отбрасываются самые старые)"""
+        dropped = self.dropped
+        overflow = len(self._users) - self.max_pending
+        if overflow > 0:
+            for user_id in list(self._users)[:overflow]:
+                del self._users[user_id]
+                # Данные пользователя не записаны - при следующем событии их нужно записать снова
+                self._seen_users.pop(user_id)
+            self.dropped += overflow
+
+        overflow = len(self._downloads) - self.max_pending
+        if overflow > 0:
+            for font_id in list(self._downloads)[:overflow]:
+                del self._downloads[font_id]
+            self.dropped += overflow
+
+        overflow = len(self._local_searches) - self.max_pending
+        if overflow > 0:
+            del self._local_searches[:overflow]
+            self.dropped += overflow
+
+        if self.dropped > dropped:
+            logging.warning(f"Буфер аналитики переполнен, отброшено событий: {self.dropped - dropped}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self, force: bool = False) -> None:
+        """Запись накопленных событий в базу данных (после ошибки - не раньше окончания паузы, если не force)"""
+        async with self._flush_lock:
+            if not self.pending or self._db is None:
+                return
+            if self._backing_off and not force:
+                return
+
+            users = list(self._users.values())
+            downloads = dict(self._downloads)
+            local_searches = self._local_searches
+            self._users = {}
+            self._downloads = Counter()
+            self._local_searches = []
+
+            try:
+                await self._db.write_analytics(users, downloads, local_searches)
+                self.flushed += len(users) + len(downloads) + len(local_searches)
+                self._failures = 0
+                self._retry_at = 0.0
+            except Exception as e:
+                self.failed_flushes += 1
+                self._failures += 1
+                backoff = min(self.flush_interval * 2 ** (self._failures - 1), self.max_backoff)
+                self._retry_at = time.monotonic() + backoff
+                logging.error(f"Ошибка при записи аналитики: {e}. Повторная попытка через {backoff:.1f} с")
+                # Возвращаем события в буфер перед более свежими, не затирая новые данные пользователей
+                self._users = {**{user[0]: user for user in users}, **self._users}
+                self._downloads.update(downloads)
+                self._local_searches[:0] = local_searches
+                # Если запись не удается, буферы не должны расти бесконечно
+                self._trim()
+
+
+analytics = AnalyticsWriter()
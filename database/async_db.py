@@ -0,0 +1,48 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from database.db import Database
+
+
+class AsyncDatabase:
+    """
+    Асинхронный фасад над Database: каждый запрос выполняется в пуле потоков БД,
+    поэтому обращения к SQLite не блокируют цикл событий.
+    Методы те же, что у Database, но их нужно вызывать через await.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        # По потоку на каждое соединение: запись + пул чтения
+        self._executor = ThreadPoolExecutor(
+            max_workers=db.connections.read_pool_size + 1, thread_name_prefix="db"
+        )
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполнение произвольной функции в потоке БД"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.db, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        # Запоминаем обертку, чтобы не создавать ее при каждом вызове
+        setattr(self, name, method)
+        return method
+
+    async def close(self) -> None:
+        """Закрытие соединения и остановка потока БД"""
+        try:
+            await self.run(self.db.close)
+        finally:
+            self._executor.shutdown(wait=True)
+            logging.info("Соединение с базой данных закрыто")
@@ -0,0 +1,177 @@
+"""
+Замер выигрыша от миграций на большой синтетической базе:
+запросы выполняются на схеме без индексов, затем применяются миграции и замер повторяется.
+
+Запуск: python -m database.benchmark --users 5000 --searches 200000 --fonts 50000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import string
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+from database.db import Database, LOCAL_SEARCH_SQL, LOCAL_SEARCH_SHORT_SQL
+from database.migrations import migrate, LATEST_VERSION
+
+
+def _random_word(rng: random.Random, length: int = 8) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def build_database(conn: sqlite3.Connection, users: int, searches: int, fonts: int,
+                   fonts_per_search: int, seed: int) -> List[str]:
+    """Заполнение базы синтетическими данными. Возвращает список slug шрифтов."""
+    rng = random.Random(seed)
+    slugs = [f"{_random_word(rng)}-{i}" for i in range(fonts)]
+    queries = [_random_word(rng, rng.randint(3, 10)) for _ in range(2000)]
+
+    conn.executemany(
+        "INSERT INTO users (user_id, username, full_name) VALUES (?, ?, ?)",
+        [(user_id, f"user{user_id}", f"User {user_id}") for user_id in range(1, users + 1)]
+    )
+    # У части названий есть однобуквенное слово ("Font A") - для замера поиска по одной букве
+    names = [
+        slug.title() + (f" {rng.choice(string.ascii_uppercase)}" if rng.random() < 0.1 else "")
+        for slug in slugs
+    ]
+    conn.executemany(
+        "INSERT INTO local_fonts (font_name, font_slug, download_url, download_count) VALUES (?, ?, ?, ?)",
+        [
+            (name, slug, f"https://font.download/dl/font/{slug}.zip", rng.randint(0, 1000))
+            for name, slug in zip(names, slugs)
+        ]
+    )
+    conn.executemany(
+        "INSERT INTO search_history (id, user_id, query, search_date) VALUES (?, ?, ?, datetime('now', ?))",
+        [
+            (search_id, rng.randint(1, users), rng.choice(queries), f"-{rng.randint(0, 365 * 24 * 3600)} seconds")
+            for search_id in range(1, searches + 1)
+        ]
+    )
+    conn.executemany(
+        "INSERT INTO found_fonts (search_id, font_name, font_slug) VALUES (?, ?, ?)",
+        [
+            (search_id, slug.title(), slug)
+            for search_id in range(1, searches + 1)
+            for slug in rng.sample(slugs, fonts_per_search)
+        ]
+    )
+    conn.executemany(
+        "INSERT INTO local_search_logs (user_id, query, results_count) VALUES (?, ?, ?)",
+        [(rng.randint(1, users), rng.choice(queries), rng.randint(0, 20)) for _ in range(searches // 2)]
+    )
+    conn.commit()
+    return slugs
+
+
+def _measure(func: Callable[[], None], repeat: int) -> float:
+    """Среднее время выполнения в миллисекундах"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def run_queries(conn: sqlite3.Connection, users: int, searches: int, slugs: List[str],
+                repeat: int, seed: int) -> Dict[str, float]:
+    """Замер типичных запросов бота"""
+    rng = random.Random(seed)
+
+    def user_history():
+        conn.execute(
+            "SELECT id, query, search_date FROM search_history WHERE user_id = ? ORDER BY search_date DESC",
+            (rng.randint(1, users),)
+        ).fetchall()
+
+    def search_fonts():
+        conn.execute(
+            "SELECT font_name, font_slug FROM found_fonts WHERE search_id = ?",
+            (rng.randint(1, searches),)
+        ).fetchall()
+
+    def font_by_slug():
+        conn.execute("SELECT * FROM local_fonts WHERE font_slug = ?", (rng.choice(slugs),)).fetchone()
+
+    has_fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'local_fonts_fts'"
+    ).fetchone() is not None
+
+    def local_search(term: str):
+        if has_fts:
+            # Те же запросы, что и в Database.search_local_fonts
+            fts_query, is_short = Database._fts_query(term)
+            if is_short:
+                conn.execute(LOCAL_SEARCH_SHORT_SQL, (fts_query, 50, 0)).fetchall()
+            else:
+                conn.execute(LOCAL_SEARCH_SQL, (fts_query, 50, 0)).fetchall()
+        else:
+            conn.execute(
+                "SELECT id FROM local_fonts WHERE font_name LIKE ? OR font_slug LIKE ? "
+                "ORDER BY download_count DESC LIMIT 50",
+                (f"%{term}%", f"%{term}%")
+            ).fetchall()
+
+    has_query_counts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'local_query_counts'"
+    ).fetchone() is not None
+
+    def top_local_queries():
+        if has_query_counts:
+            conn.execute("SELECT query, count FROM local_query_counts ORDER BY count DESC LIMIT 5").fetchall()
+        else:
+            conn.execute(
+                "SELECT query, COUNT(*) AS count FROM local_search_logs GROUP BY query ORDER BY count DESC LIMIT 5"
+            ).fetchall()
+
+    return {
+        "История пользователя": _measure(user_history, repeat),
+        "Шрифты поиска": _measure(search_fonts, repeat),
+        "Шрифт по slug": _measure(font_by_slug, repeat),
+        "Топ локальных запросов": _measure(top_local_queries, max(repeat // 10, 1)),
+        "Локальный поиск": _measure(lambda: local_search(rng.choice(slugs)[:4]), repeat),
+        # Худший случай: префикс совпадает с большой частью базы
+        "Локальный поиск (2 буквы)": _measure(lambda: local_search(rng.choice(slugs)[:2]), repeat),
+        "Локальный поиск (1 буква)": _measure(lambda: local_search(rng.choice(slugs)[:1]), repeat),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Замер выигрыша от индексов миграций")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--searches", type=int, default=200000)
+    parser.add_argument("--fonts", type=int, default=50000)
+    parser.add_argument("--fonts-per-search", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(os.path.join(tmp_dir, "benchmark.db"))
+
+        # Схема без индексов (версия 1)
+        migrate(conn, target=1)
+
+        started = time.perf_counter()
+        slugs = build_database(conn, args.users, args.searches, args.fonts, args.fonts_per_search, args.seed)
+        print(f"Синтетическая база заполнена за {time.perf_counter() - started:.1f} с")
+
+        before = run_queries(conn, args.users, args.searches, slugs, args.repeat, args.seed)
+
+        started = time.perf_counter()
+        migrate(conn)
+        print(f"Миграции до версии {LATEST_VERSION} применены за {time.perf_counter() - started:.1f} с")
+
+        after = run_queries(conn, args.users, args.searches, slugs, args.repeat, args.seed)
+        conn.close()
+
+    rows: List[Tuple[str, float, float]] = [(name, before[name], after[name]) for name in before]
+    print(f"\n{'Запрос':<26}{'до, мс':>12}{'после, мс':>12}{'ускорение':>12}")
+    for name, before_ms, after_ms in rows:
+        print(f"{name:<26}{before_ms:>12.3f}{after_ms:>12.3f}{before_ms / max(after_ms, 1e-6):>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
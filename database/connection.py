@@ -0,0 +1,76 @@
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from config import (
+    DB_READ_POOL_SIZE, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_STATEMENT_CACHE_SIZE, DB_BUSY_TIMEOUT
+)
+
+
+class ConnectionManager:
+    """
+    Постоянные соединения с SQLite: одно соединение на запись (под блокировкой)
+    и пул соединений на чтение. В режиме WAL читатели не блокируют запись.
+    """
+
+    def __init__(self, db_path: str, read_pool_size: int = DB_READ_POOL_SIZE):
+        self.db_path = db_path
+        self.read_pool_size = read_pool_size
+
+        self._write_lock = threading.RLock()
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode = WAL")
+
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._all_readers: List[sqlite3.Connection] = []
+        for _ in range(read_pool_size):
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._all_readers.append(conn)
+            self._readers.put(conn)
+
+        logging.info(f"База данных открыта: 1 соединение на запись, {read_pool_size} на чтение")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DB_BUSY_TIMEOUT,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE_SIZE
+        )
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        # Отрицательное значение - размер кеша в КБ, а не в страницах
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        return conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Соединение на запись: фиксация при выходе, откат при ошибке"""
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Соединение на чтение из пула"""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def close(self) -> None:
+        """Закрытие всех соединений"""
+        with self._write_lock:
+            self._writer.close()
+        for conn in self._all_readers:
+            conn.close()
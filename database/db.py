@@ -1,205 +1,225 @@
 import sqlite3
-import datetime
-from datetime import datetime
 import os
+import re
+import time
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Callable, List, Dict, Any, Optional, Tuple
+
+from database.connection import ConnectionManager
+from database.migrations import migrate
+from services.font_result import FontResult
+from utils.lru_cache import LRUCache
+from config import (
+    HISTORY_PAGE_SIZE, ADMIN_PAGE_SIZE, ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL,
+    DASHBOARD_CACHE_TTL
+)
+
+# Поиск по локальной базе: все совпадения ранжируются bm25 (название важнее slug,
+# дизайнера и производителя) с усилением популярностью, но не более чем вдвое
+LOCAL_SEARCH_SQL = """
+    SELECT lf.* FROM local_fonts_fts
+    JOIN local_fonts lf ON lf.id = local_fonts_fts.rowid
+    WHERE local_fonts_fts MATCH ?
+    ORDER BY bm25(local_fonts_fts, 10.0, 5.0, 2.0, 1.0)
+             * (1.0 + lf.download_count / (lf.download_count + 10.0))
+    LIMIT ? OFFSET ?
+"""
+
+# Запрос только из односимвольных слов ("a", "1"): индекс префиксов их не покрывает, поэтому
+# они ищутся как целые слова. bm25 таким совпадениям ничего не добавляет - все они ранжируются
+# по популярности, без подсчета bm25 для каждого
+LOCAL_SEARCH_SHORT_SQL = """
+    SELECT lf.* FROM local_fonts lf
+    WHERE lf.id IN (SELECT rowid FROM local_fonts_fts WHERE local_fonts_fts MATCH ?)
+    ORDER BY lf.download_count DESC, lf.id
+    LIMIT ? OFFSET ?
+"""
 
 class Database:
     def __init__(self, db_file):
         self.db_path = db_file
-        self.connection = sqlite3.connect(db_file)
-        self.cursor = self.connection.cursor()
+        self.connections = ConnectionManager(db_file)
+        self._font_listeners: List[Callable[[int, Optional[str]], None]] = []
+        # Сводная статистика админ-панели
+        self._dashboard_cache = LRUCache(maxsize=1, ttl=DASHBOARD_CACHE_TTL)
+        # Шрифты и пользователи по ID; записи сбрасываются при изменении в базе
+        self._font_cache = LRUCache(maxsize=ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL)
+        self._user_cache = LRUCache(maxsize=ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL)
         self._create_tables()
     
     def _create_tables(self):
-        """Создание необходимых таблиц в базе данных"""
-        # Таблица пользователей
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            full_name TEXT,
-            is_admin INTEGER DEFAULT 0,
-            registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        
-        # Таблица истории поиска
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS search_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            query TEXT,
-            search_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (user_id)
-        )
-        """)
-        
-        # Таблица найденных шрифтов
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS found_fonts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            search_id INTEGER,
-            font_name TEXT,
-            font_slug TEXT,
-            designer TEXT,
-            manufacturer TEXT,
-            user_fullname TEXT,
-            url TEXT,
-            download_url TEXT,
-            FOREIGN KEY (search_id) REFERENCES search_history (id)
-        )
-        """)
-        
-        # Таблица локальных шрифтов (кеш)
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS local_fonts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            font_name TEXT,
-            font_slug TEXT,
-            designer TEXT,
-            manufacturer TEXT,
-            user_fullname TEXT,
-            url TEXT,
-            download_url TEXT,
-            file_path TEXT,
-            added_by_user_id INTEGER,
-            added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            download_count INTEGER DEFAULT 0,
-            is_document BOOLEAN DEFAULT 0,
-            FOREIGN KEY (added_by_user_id) REFERENCES users (user_id)
-        )
-        """)
-        
-        # Таблица статистики по локальным шрифтам
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS font_stats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            total_fonts INTEGER DEFAULT 0,
-            total_documents INTEGER DEFAULT 0,
-            local_searches INTEGER DEFAULT 0,
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        
-        # Таблица логов поиска в локальной базе
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS local_search_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            query TEXT,
-            results_count INTEGER,
-            search_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (user_id)
-        )
-        """)
-        
-        # Вставляем начальную запись в таблицу статистики, если она пуста
-        self.cursor.execute("SELECT COUNT(*) FROM font_stats")
-        if self.cursor.fetchone()[0] == 0:
-            self.cursor.execute("INSERT INTO font_stats (total_fonts, total_documents, local_searches) VALUES (0, 0, 0)")
-        
-        self.connection.commit()
+        """Создание и обновление схемы базы данных (миграции пропускаются, если схема актуальна)"""
+        with self.connections.writer() as conn:
+            migrate(conn)
     
-    def add_user(self, user_id: int, username: str, full_name: str) -> None:
-        """Добавление нового пользователя или обновление информации о существующем"""
-        self.cursor.execute(
-            "INSERT OR REPLACE INTO users (user_id, username, full_name) VALUES (?, ?, ?)",
-            (user_id, username, full_name)
-        )
-        self.connection.commit()
+    def add_font_listener(self, listener: Callable[[int, Optional[str]], None]) -> None:
+        """
+        Подписка на добавление и удаление локальных шрифтов.
+        Слушатель получает ID и название шрифта (None - шрифт удален).
+        """
+        self._font_listeners.append(listener)
     
-    def set_admin(self, user_id: int, is_admin: bool = True) -> None:
-        """Установка или снятие прав администратора"""
-        self.cursor.execute(
-            "UPDATE users SET is_admin = ? WHERE user_id = ?",
-            (1 if is_admin else 0, user_id)
-        )
-        self.connection.commit()
+    def _notify_fonts(self, changes: List[Tuple[int, Optional[str]]]) -> None:
+        """Оповещение слушателей после фиксации транзакции"""
+        for listener in self._font_listeners:
+            for font_id, font_name in changes:
+                try:
+                    listener(font_id, font_name)
+                except Exception as e:
+                    logging.error(f"Ошибка в слушателе изменений шрифтов: {e}")
     
-    def is_admin(self, user_id):
-        """Проверка, является ли пользователь администратором"""
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT is_admin FROM users WHERE user_id = ?', (user_id,))
-            result = cursor.fetchone()
+    # Права администратора и дата регистрации при обновлении пользователя сохраняются
+    _UPSERT_USER = """
+        INSERT INTO users (user_id, username, full_name) VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            username = excluded.username,
+            full_name = excluded.full_name
+    """
+    
+    def write_analytics(self, users: List[Tuple[int, str, str]], downloads: Dict[int, int],
+                        local_searches: List[Tuple[int, str, int, str]]) -> None:
+        """Запись накопленных аналитических событий одной транзакцией"""
+        with self.connections.writer() as conn:
+            if users:
+                conn.executemany(self._UPSERT_USER, users)
+            
+            if downloads:
+                conn.executemany(
+                    "UPDATE local_fonts SET download_count = download_count + ? WHERE id = ?",
+                    [(count, font_id) for font_id, count in downloads.items()]
+                )
             
-            return bool(result and result[0])
-        except Exception as e:
-            logging.error(f"Ошибка при проверке статуса администратора: {e}")
-            return False
-        finally:
-            if conn:
-                conn.close()
-    
-    def add_search_query(self, user_id: int, query: str) -> int:
-        """Добавление поискового запроса в историю"""
-        self.cursor.execute(
-            "INSERT INTO search_history (user_id, query) VALUES (?, ?)",
-            (user_id, query)
-        )
-        self.connection.commit()
-        return self.cursor.lastrowid
-    
-    def add_found_font(self, search_id: int, font_data: Dict[str, Any]) -> None:
-        """Добавление найденного шрифта в базу данных"""
-        data = font_data["data"]
-        download_url = f"https://font.download/dl/font/{data['slug']}.zip"
-        
-        self.cursor.execute(
-            """
-            INSERT INTO found_fonts 
-            (search_id, font_name, font_slug, designer, manufacturer, user_fullname, url, download_url) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                search_id,
-                data.get("font_name", ""),
-                data.get("slug", ""),
-                data.get("designer", ""),
-                data.get("manufacturer", ""),
-                data.get("user_fullname", ""),
-                data.get("url", ""),
-                download_url
-            )
-        )
-        self.connection.commit()
+            if local_searches:
+                conn.executemany(
+                    'INSERT INTO local_search_logs (user_id, query, results_count, search_date) VALUES (?, ?, ?, ?)',
+                    local_searches
+                )
         
-        # Автоматически добавляем шрифт в локальную базу, если его там еще нет
-        self._add_to_local_fonts(data, search_id)
+        for user in users:
+            self._user_cache.pop(user[0])
+        for font_id in downloads:
+            self._font_cache.pop(font_id)
     
-    def _add_to_local_fonts(self, font_data: Dict[str, Any], search_id: int = None) -> None:
-        """Внутренний метод для добавления шрифта в локальную базу"""
-        # Проверяем, есть ли уже такой шрифт в базе
-        self.cursor.execute(
-            "SELECT id FROM local_fonts WHERE font_slug = ?",
-            (font_data.get("slug", ""),)
-        )
-        
-        if self.cursor.fetchone() is None:
-            # Получаем информацию о пользователе, который выполнил поиск
-            user_id = None
-            if search_id:
-                self.cursor.execute(
-                    "SELECT user_id FROM search_history WHERE id = ?",
-                    (search_id,)
+    def set_admin(self, user_id: int, is_admin: bool = True) -> None:
+        """
+        Установка или снятие прав администратора. При назначении запись пользователя
+        создается, если ее еще нет (данные пользователя могут быть еще в буфере аналитики).
+        """
+        with self.connections.writer() as conn:
+            if is_admin:
+                conn.execute(
+                    """
+                    INSERT INTO users (user_id, is_admin) VALUES (?, 1)
+                    ON CONFLICT(user_id) DO UPDATE SET is_admin = 1
+                    """,
+                    (user_id,)
+                )
+            else:
+                conn.execute("UPDATE users SET is_admin = 0 WHERE user_id = ?", (user_id,))
+        self._user_cache.pop(user_id)
+    
+    def get_admin_ids(self) -> List[int]:
+        """ID пользователей, отмеченных администраторами в базе"""
+        with self.connections.reader() as conn:
+            return [row[0] for row in conn.execute("SELECT user_id FROM users WHERE is_admin = 1")]
+    
+    def save_search_results(self, user_id: int, query: str, results: List[FontResult],
+                            is_fuzzy: bool = False) -> int:
+        """
+        Сохранение поискового запроса и найденных шрифтов одной транзакцией.
+        Новые шрифты добавляются в локальную базу, уже известные пропускаются.
+        is_fuzzy - результаты являются похожими названиями из локальной базы.
+        """
+        added = []
+        
+        with self.connections.writer() as conn:
+            search_id = conn.execute(
+                "INSERT INTO search_history (user_id, query, is_fuzzy) VALUES (?, ?, ?)",
+                (user_id, query, int(is_fuzzy))
+            ).lastrowid
+            
+            if results:
+                conn.executemany(
+                    """
+                    INSERT INTO found_fonts 
+                    (search_id, font_name, font_slug, designer, manufacturer, user_fullname, url, download_url) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (
+                            search_id,
+                            font.font_name,
+                            font.slug,
+                            font.designer,
+                            font.manufacturer,
+                            font.user_fullname,
+                            font.url,
+                            font.download_url
+                        )
+                        for font in results
+                    ]
+                )
+            
+                # Автоматически добавляем шрифты в локальную базу, если их там еще нет
+                last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM local_fonts").fetchone()[0]
+                cursor = conn.executemany(
+                    """
+                    INSERT INTO local_fonts 
+                    (font_name, font_slug, designer, manufacturer, user_fullname, url, download_url, added_by_user_id) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(font_slug) DO NOTHING
+                    """,
+                    [
+                        (
+                            font.font_name,
+                            font.slug,
+                            font.designer,
+                            font.manufacturer,
+                            font.user_fullname,
+                            font.url,
+                            font.download_url,
+                            user_id
+                        )
+                        for font in results
+                    ]
                 )
-                result = self.cursor.fetchone()
-                if result:
-                    user_id = result[0]
             
-            download_url = f"https://font.download/dl/font/{font_data.get('slug', '')}.zip"
+                # Статистику обновляют триггеры, здесь только собираем новые шрифты для слушателей
+                if cursor.rowcount > 0:
+                    added = conn.execute(
+                        "SELECT id, font_name FROM local_fonts WHERE id > ?",
+                        (last_id,)
+                    ).fetchall()
+        
+        # В записи пользователя хранится количество его поисков
+        self._user_cache.pop(user_id)
+        self._notify_fonts(added)
+        return search_id
+    
+    def add_font_document(self, user_id: int, font_data: Dict[str, Any], file_path: str,
+                          content_hash: Optional[str] = None) -> None:
+        """Добавление шрифта, отправленного как документ (существующий шрифт с тем же slug обновляется)"""
+        download_url = f"https://font.download/dl/font/{font_data.get('slug', '')}.zip"
+        
+        with self.connections.writer() as conn:
+            existing = conn.execute(
+                "SELECT 1 FROM local_fonts WHERE font_slug = ?",
+                (font_data.get("slug", ""),)
+            ).fetchone()
             
-            # Добавляем шрифт в локальную базу
-            self.cursor.execute(
+            # При смене содержимого сохраненный file_id Telegram больше не актуален
+            conn.execute(
                 """
                 INSERT INTO local_fonts 
-                (font_name, font_slug, designer, manufacturer, user_fullname, url, download_url, added_by_user_id) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                (font_name, font_slug, designer, manufacturer, user_fullname, url, download_url, 
+                 file_path, content_hash, added_by_user_id, is_document) 
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+                ON CONFLICT(font_slug) DO UPDATE SET
+                    file_path = excluded.file_path,
+                    telegram_file_id = CASE WHEN content_hash = excluded.content_hash
+                                            THEN telegram_file_id ELSE NULL END,
+                    content_hash = excluded.content_hash,
+                    is_document = 1
                 """,
                 (
                     font_data.get("font_name", ""),
@@ -209,254 +229,237 @@ class Database:
                     font_data.get("user_fullname", ""),
                     font_data.get("url", ""),
                     download_url,
+                    file_path,
+                    content_hash,
                     user_id
                 )
             )
             
-            # Обновляем статистику
-            self.cursor.execute(
-                """
-                UPDATE font_stats 
-                SET total_fonts = total_fonts + 1, 
-                    last_updated = CURRENT_TIMESTAMP
+            font_id, font_name = conn.execute(
+                "SELECT id, font_name FROM local_fonts WHERE font_slug = ?",
+                (font_data.get("slug", ""),)
+            ).fetchone()
+        
+        self._font_cache.pop(font_id)
+        self._notify_fonts([] if existing else [(font_id, font_name)])
+    
+    def set_font_file(self, font_slug: str, file_path: str, content_hash: str) -> int:
+        """Привязка шрифта к файлу в хранилище (запись создается, если шрифта еще нет в базе)"""
+        with self.connections.writer() as conn:
+            # При смене содержимого сохраненный file_id Telegram больше не актуален
+            cursor = conn.execute(
                 """
+                UPDATE local_fonts 
+                SET file_path = ?, 
+                    telegram_file_id = CASE WHEN content_hash = ? THEN telegram_file_id ELSE NULL END,
+                    content_hash = ?
+                WHERE font_slug = ?
+                """,
+                (file_path, content_hash, content_hash, font_slug)
             )
             
-            self.connection.commit()
-    
-    def add_font_document(self, user_id: int, font_data: Dict[str, Any], file_path: str) -> None:
-        """Добавление шрифта, отправленного как документ"""
-        download_url = f"https://font.download/dl/font/{font_data.get('slug', '')}.zip"
+            is_new = cursor.rowcount == 0
+            if is_new:
+                conn.execute(
+                    """
+                    INSERT INTO local_fonts (font_name, font_slug, download_url, file_path, content_hash)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (font_slug, font_slug, f"https://font.download/dl/font/{font_slug}.zip", file_path, content_hash)
+                )
+            
+            font_id = conn.execute("SELECT id FROM local_fonts WHERE font_slug = ?", (font_slug,)).fetchone()[0]
         
-        self.cursor.execute(
-            """
-            INSERT INTO local_fonts 
-            (font_name, font_slug, designer, manufacturer, user_fullname, url, download_url, 
-             file_path, added_by_user_id, is_document) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-            """,
-            (
-                font_data.get("font_name", ""),
-                font_data.get("slug", ""),
-                font_data.get("designer", ""),
-                font_data.get("manufacturer", ""),
-                font_data.get("user_fullname", ""),
-                font_data.get("url", ""),
-                download_url,
-                file_path,
-                user_id
+        self._font_cache.pop(font_id)
+        if is_new:
+            self._notify_fonts([(font_id, font_slug)])
+        return font_id
+    
+    def set_font_telegram_file_id(self, font_id: int, file_id: str) -> None:
+        """Сохранение file_id Telegram для повторной отправки шрифта"""
+        with self.connections.writer() as conn:
+            conn.execute(
+                "UPDATE local_fonts SET telegram_file_id = ? WHERE id = ?",
+                (file_id, font_id)
             )
-        )
-        
-        # Обновляем статистику
-        self.cursor.execute(
-            """
-            UPDATE font_stats 
-            SET total_fonts = total_fonts + 1, 
-                total_documents = total_documents + 1,
-                last_updated = CURRENT_TIMESTAMP
-            """
-        )
-        
-        self.connection.commit()
+        self._font_cache.pop(font_id)
     
-    def increment_font_download_count(self, font_id: int) -> None:
-        """Увеличение счетчика загрузок шрифта"""
-        self.cursor.execute(
-            "UPDATE local_fonts SET download_count = download_count + 1 WHERE id = ?",
-            (font_id,)
-        )
-        self.connection.commit()
+    # Поля шрифта вместе с добавившим его пользователем (см. _font_row)
+    _FONT_SELECT = """
+        SELECT lf.id, lf.font_name, lf.font_slug, lf.designer, lf.manufacturer, 
+               lf.user_fullname, lf.url, lf.download_url, lf.file_path, 
+               lf.added_date, lf.download_count, lf.is_document, lf.telegram_file_id,
+               u.user_id, u.username, u.full_name
+        FROM local_fonts lf
+        LEFT JOIN users u ON lf.added_by_user_id = u.user_id
+    """
+    
+    @staticmethod
+    def _font_row(row: Tuple) -> Dict[str, Any]:
+        (font_id, font_name, font_slug, designer, manufacturer, 
+         user_fullname, url, download_url, file_path, 
+         added_date, download_count, is_document, telegram_file_id,
+         user_id, username, full_name) = row
+        
+        return {
+            "id": font_id,
+            "font_name": font_name,
+            "font_slug": font_slug,
+            "designer": designer,
+            "manufacturer": manufacturer,
+            "user_fullname": user_fullname,
+            "url": url,
+            "download_url": download_url,
+            "file_path": file_path,
+            "added_date": added_date,
+            "download_count": download_count,
+            "is_document": bool(is_document),
+            "telegram_file_id": telegram_file_id,
+            "added_by": {
+                "user_id": user_id,
+                "username": username,
+                "full_name": full_name
+            } if user_id else None
+        }
     
     def get_local_fonts(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
         """Получение списка локальных шрифтов"""
-        self.cursor.execute(
-            """
-            SELECT lf.id, lf.font_name, lf.font_slug, lf.designer, lf.manufacturer, 
-                   lf.user_fullname, lf.url, lf.download_url, lf.file_path, 
-                   lf.added_date, lf.download_count, lf.is_document,
-                   u.user_id, u.username, u.full_name
-            FROM local_fonts lf
-            LEFT JOIN users u ON lf.added_by_user_id = u.user_id
-            ORDER BY lf.added_date DESC
-            LIMIT ? OFFSET ?
-            """,
-            (limit, offset)
-        )
+        with self.connections.reader() as conn:
+            rows = conn.execute(
+                f"{self._FONT_SELECT} ORDER BY lf.added_date DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
         
-        fonts = []
-        for row in self.cursor.fetchall():
-            (font_id, font_name, font_slug, designer, manufacturer, 
-             user_fullname, url, download_url, file_path, 
-             added_date, download_count, is_document,
-             user_id, username, full_name) = row
-            
-            fonts.append({
-                "id": font_id,
-                "font_name": font_name,
-                "font_slug": font_slug,
-                "designer": designer,
-                "manufacturer": manufacturer,
-                "user_fullname": user_fullname,
-                "url": url,
-                "download_url": download_url,
-                "file_path": file_path,
-                "added_date": added_date,
-                "download_count": download_count,
-                "is_document": bool(is_document),
-                "added_by": {
-                    "user_id": user_id,
-                    "username": username,
-                    "full_name": full_name
-                } if user_id else None
-            })
+        return [self._font_row(row) for row in rows]
+    
+    def get_local_font_by_id(self, font_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Получение шрифта локальной базы по ID (из кеша или одним запросом по первичному ключу).
+        Возвращаемый словарь общий для всех вызовов, изменять его нельзя.
+        """
+        font = self._font_cache.get(font_id)
+        if font is not None:
+            return font
+        
+        with self.connections.reader() as conn:
+            row = conn.execute(f"{self._FONT_SELECT} WHERE lf.id = ?", (font_id,)).fetchone()
+        
+        if not row:
+            return None
         
-        return fonts
+        font = self._font_row(row)
+        self._font_cache.set(font_id, font)
+        return font
     
-    def log_local_search(self, user_id: int, query: str, results_count: int) -> bool:
-        """Логирование поиска в локальной базе"""
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Записываем информацию о поиске
-            search_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            cursor.execute(
-                'INSERT INTO local_search_logs (user_id, query, results_count, search_date) VALUES (?, ?, ?, ?)',
-                (user_id, query, results_count, search_date)
-            )
-            
-            # Обновляем счетчик локальных поисков
-            cursor.execute('UPDATE font_stats SET local_searches = local_searches + 1 WHERE id = 1')
-            
-            conn.commit()
-            logging.info(f"Поиск пользователя {user_id} по запросу '{query}' успешно залогирован")
-            
-            return True
-        except Exception as e:
-            logging.error(f"Ошибка при логировании поиска: {e}")
-            return False
-        finally:
-            if conn:
-                conn.close()
-    
-    def get_local_search_stats(self):
-        """Получение статистики по локальным поискам"""
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Получаем общее количество поисков
-            cursor.execute('SELECT COUNT(*) FROM local_search_logs')
-            total_searches = cursor.fetchone()[0]
-            
-            # Получаем количество уникальных пользователей
-            cursor.execute('SELECT COUNT(DISTINCT user_id) FROM local_search_logs')
-            unique_users = cursor.fetchone()[0]
-            
-            # Получаем количество уникальных запросов
-            cursor.execute('SELECT COUNT(DISTINCT query) FROM local_search_logs')
-            unique_queries = cursor.fetchone()[0]
-            
-            # Получаем среднее количество результатов
-            cursor.execute('SELECT AVG(results_count) FROM local_search_logs')
-            avg_results = cursor.fetchone()[0] or 0
-            
-            # Получаем топ-5 популярных запросов
-            cursor.execute('''
-                SELECT query, COUNT(*) as count 
-                FROM local_search_logs 
-                GROUP BY query 
-                ORDER BY count DESC 
-                LIMIT 5
-            ''')
-            top_queries = cursor.fetchall()
-            
-            return {
-                "total_searches": total_searches,
-                "unique_users": unique_users,
-                "unique_queries": unique_queries,
-                "avg_results": avg_results,
+    def get_user_by_id(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Получение пользователя по ID вместе с количеством его поисков (из кеша или из базы).
+        Возвращаемый словарь общий для всех вызовов, изменять его нельзя.
+        """
+        user = self._user_cache.get(user_id)
+        if user is not None:
+            return user
+        
+        with self.connections.reader() as conn:
+            row = conn.execute(
+                """
+                SELECT user_id, username, full_name, is_admin, registration_date,
+                       (SELECT COUNT(*) FROM search_history WHERE user_id = users.user_id)
+                FROM users
+                WHERE user_id = ?
+                """,
+                (user_id,)
+            ).fetchone()
+        
+        if not row:
+            return None
+        
+        user = self._user_row(row)
+        self._user_cache.set(user_id, user)
+        return user
+    
+    def get_dashboard_snapshot(self) -> Dict[str, Any]:
+        """
+        Сводная статистика для админ-панели: одна строка dashboard_stats, поддерживаемая
+        триггерами, и топ запросов локального поиска по индексу счетчиков.
+        Результат кешируется на DASHBOARD_CACHE_TTL секунд.
+        """
+        snapshot = self._dashboard_cache.get("snapshot")
+        if snapshot is not None:
+            return snapshot
+        
+        with self.connections.reader() as conn:
+            row = conn.execute(
+                """
+                SELECT user_count, admin_count, search_count, font_count, document_count, download_count,
+                       local_search_count, local_search_results, local_search_users, local_search_queries
+                FROM dashboard_stats WHERE id = 1
+                """
+            ).fetchone() or (0,) * 10
+            top_queries = conn.execute(
+                "SELECT query, count FROM local_query_counts ORDER BY count DESC LIMIT 5"
+            ).fetchall()
+        
+        (user_count, admin_count, search_count, font_count, document_count, download_count,
+         local_search_count, local_search_results, local_search_users, local_search_queries) = row
+        
+        snapshot = {
+            "user_count": user_count,
+            "admin_count": admin_count,
+            "search_count": search_count,
+            "font_count": font_count,
+            "document_count": document_count,
+            "total_downloads": download_count,
+            "local_searches": {
+                "total_searches": local_search_count,
+                "unique_users": local_search_users,
+                "unique_queries": local_search_queries,
+                "avg_results": local_search_results / local_search_count if local_search_count else 0,
                 "top_queries": top_queries
             }
-        except Exception as e:
-            logging.error(f"Ошибка при получении статистики локальных поисков: {e}")
-            return {
-                "total_searches": 0,
-                "unique_users": 0,
-                "unique_queries": 0,
-                "avg_results": 0,
-                "top_queries": []
-            }
-        finally:
-            if conn:
-                conn.close()
+        }
+        self._dashboard_cache.set("snapshot", snapshot)
+        return snapshot
     
-    def get_font_stats(self):
-        """Получение статистики по шрифтам"""
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Получаем статистику из таблицы font_stats
-            cursor.execute('SELECT * FROM font_stats WHERE id = 1')
-            row = cursor.fetchone()
-            
-            if row:
-                return {
-                    "total_fonts": row[1],
-                    "total_downloads": row[2],
-                    "document_count": row[3],
-                    "local_searches": row[4]
-                }
-            else:
-                return {
-                    "total_fonts": 0,
-                    "total_downloads": 0,
-                    "document_count": 0,
-                    "local_searches": 0
-                }
-        except Exception as e:
-            logging.error(f"Ошибка при получении статистики по шрифтам: {e}")
-            return {
-                "total_fonts": 0,
-                "total_downloads": 0,
-                "document_count": 0,
-                "local_searches": 0
-            }
-        finally:
-            if conn:
-                conn.close()
+    @staticmethod
+    def _fts_query(query: str) -> Tuple[str, bool]:
+        """
+        Преобразование пользовательского запроса в запрос FTS5 и признак запроса
+        только из односимвольных слов. Слова из двух и более символов ищутся как префиксы
+        (их покрывает индекс префиксов), односимвольные - как целые слова.
+        """
+        words = re.findall(r"\w+", query.lower())
+        fts_query = " ".join(f'"{word}"*' if len(word) > 1 else f'"{word}"' for word in words)
+        is_short = all(len(word) == 1 for word in words)
+        return fts_query, is_short
     
-    def search_local_fonts(self, query):
-        """Поиск шрифтов в локальной базе данных"""
-        conn = None
+    def search_local_fonts(self, query: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Полнотекстовый поиск шрифтов в локальной базе данных.
+        Совпадения ранжируются bm25 с учетом популярности; у запроса только
+        из односимвольных слов - по популярности.
+        """
+        fts_query, is_short = self._fts_query(query)
+        if not fts_query:
+            return []
+        
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # Выполняем поиск по имени шрифта или slug
-            search_query = f"%{query}%"
-            cursor.execute('''
-                SELECT * FROM local_fonts 
-                WHERE font_name LIKE ? OR font_slug LIKE ?
-                ORDER BY download_count DESC
-            ''', (search_query, search_query))
-            
-            results = [dict(row) for row in cursor.fetchall()]
+            with self.connections.reader() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
+                
+                if is_short:
+                    cursor.execute(LOCAL_SEARCH_SHORT_SQL, (fts_query, limit, offset))
+                else:
+                    cursor.execute(LOCAL_SEARCH_SQL, (fts_query, limit, offset))
+                
+                results = [dict(row) for row in cursor.fetchall()]
             
             logging.info(f"Найдено {len(results)} шрифтов в локальной базе по запросу '{query}'")
             return results
         except Exception as e:
             logging.error(f"Ошибка при поиске в локальной базе: {e}")
             return []
-        finally:
-            if conn:
-                conn.close()
     
     def _calculate_relevance(self, query: str, font_name: str, designer: str, manufacturer: str) -> float:
         """Вычисляет релевантность шрифта для поискового запроса"""
@@ -500,116 +503,119 @@ class Database:
     
     def delete_local_font(self, font_id: int) -> bool:
         """Удаление шрифта из локальной базы"""
-        # Проверяем, существует ли шрифт
-        self.cursor.execute("SELECT file_path, is_document FROM local_fonts WHERE id = ?", (font_id,))
-        result = self.cursor.fetchone()
-        if not result:
-            return False
-        
-        file_path, is_document = result
-        
-        # Удаляем файл, если он существует и является документом
-        if file_path and is_document and os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-            except OSError:
-                pass  # Игнорируем ошибки при удалении файла
-        
-        # Обновляем статистику
-        self.cursor.execute(
-            """
-            UPDATE font_stats 
-            SET total_fonts = total_fonts - 1,
-                total_documents = CASE WHEN ? THEN total_documents - 1 ELSE total_documents END,
-                last_updated = CURRENT_TIMESTAMP
-            """,
-            (bool(is_document),)
-        )
-        
-        # Удаляем запись из базы
-        self.cursor.execute("DELETE FROM local_fonts WHERE id = ?", (font_id,))
-        self.connection.commit()
-        
+        with self.connections.writer() as conn:
+            # Проверяем, существует ли шрифт
+            result = conn.execute("SELECT file_path, is_document FROM local_fonts WHERE id = ?", (font_id,)).fetchone()
+            if not result:
+                return False
+            
+            file_path, is_document = result
+            
+            # Файл в хранилище может использоваться другими шрифтами
+            is_shared = conn.execute(
+                "SELECT COUNT(*) FROM local_fonts WHERE file_path = ? AND id != ?",
+                (file_path, font_id)
+            ).fetchone()[0] > 0
+            
+            # Удаляем файл, если он существует, является документом и больше ни на кого не ссылается
+            if file_path and is_document and not is_shared and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass  # Игнорируем ошибки при удалении файла
+            
+            # Удаляем запись из базы
+            conn.execute("DELETE FROM local_fonts WHERE id = ?", (font_id,))
+        
+        self._font_cache.pop(font_id)
+        self._notify_fonts([(font_id, None)])
         return True
     
-    def get_user_search_history(self, user_id: int) -> List[Dict[str, Any]]:
-        """Получение истории поиска пользователя"""
-        self.cursor.execute(
-            """
-            SELECT id, query, search_date
-            FROM search_history
-            WHERE user_id = ?
-            ORDER BY search_date DESC
-            """,
-            (user_id,)
-        )
+    def get_user_search_history(self, user_id: int, limit: int = HISTORY_PAGE_SIZE,
+                                older_than: Optional[int] = None,
+                                newer_than: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Страница истории поиска пользователя (от новых к старым) с количеством найденных шрифтов.
+        Пагинация по ключу (search_date, id): older_than/newer_than - ID поиска, от которого
+        берется следующая или предыдущая страница. Шрифты поисков не загружаются.
+        """
+        if newer_than is not None:
+            condition = "AND (search_date, id) > (SELECT search_date, id FROM search_history WHERE id = ?)"
+            order = "ASC"
+            params = (user_id, newer_than, limit + 1)
+        elif older_than is not None:
+            condition = "AND (search_date, id) < (SELECT search_date, id FROM search_history WHERE id = ?)"
+            order = "DESC"
+            params = (user_id, older_than, limit + 1)
+        else:
+            condition = ""
+            order = "DESC"
+            params = (user_id, limit + 1)
+        
+        with self.connections.reader() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT page.id, page.query, page.search_date, COUNT(ff.id) AS font_count
+                FROM (
+                    SELECT id, query, search_date
+                    FROM search_history
+                    WHERE user_id = ? {condition}
+                    ORDER BY search_date {order}, id {order}
+                    LIMIT ?
+                ) page
+                LEFT JOIN found_fonts ff ON ff.search_id = page.id
+                GROUP BY page.id
+                ORDER BY page.search_date {order}, page.id {order}
+                """,
+                params
+            ).fetchall()
         
-        history = []
-        for row in self.cursor.fetchall():
-            search_id, query, search_date = row
+        rows, has_older, has_newer = self._keyset_page(rows, limit, older_than, newer_than)
+        return {
+            "items": [
+                {
+                    "id": search_id,
+                    "query": query,
+                    "search_date": search_date,
+                    "font_count": font_count
+                }
+                for search_id, query, search_date, font_count in rows
+            ],
+            "has_older": has_older,
+            "has_newer": has_newer
+        }
+    
+    def get_search_details(self, search_id: int) -> Optional[Dict[str, Any]]:
+        """Получение подробной информации о конкретном поиске"""
+        with self.connections.reader() as conn:
+            row = conn.execute(
+                """
+                SELECT sh.id, sh.query, sh.search_date, sh.is_fuzzy, sh.user_id, u.username, u.full_name
+                FROM search_history sh
+                LEFT JOIN users u ON sh.user_id = u.user_id
+                WHERE sh.id = ?
+                """,
+                (search_id,)
+            ).fetchone()
+            
+            if not row:
+                return None
+            
+            search_id, query, search_date, is_fuzzy, user_id, username, full_name = row
             
             # Получаем найденные шрифты для этого поиска
-            self.cursor.execute(
+            font_rows = conn.execute(
                 """
                 SELECT font_name, font_slug, designer, manufacturer, user_fullname, url, download_url
                 FROM found_fonts
                 WHERE search_id = ?
+                ORDER BY id
                 """,
                 (search_id,)
-            )
-            
-            fonts = []
-            for font_row in self.cursor.fetchall():
-                font_name, font_slug, designer, manufacturer, user_fullname, url, download_url = font_row
-                fonts.append({
-                    "font_name": font_name,
-                    "font_slug": font_slug,
-                    "designer": designer,
-                    "manufacturer": manufacturer,
-                    "user_fullname": user_fullname,
-                    "url": url,
-                    "download_url": download_url
-                })
-            
-            history.append({
-                "id": search_id,
-                "query": query,
-                "search_date": search_date,
-                "fonts": fonts
-            })
-        
-        return history
-    
-    def get_search_details(self, search_id: int) -> Optional[Dict[str, Any]]:
-        """Получение подробной информации о конкретном поиске"""
-        self.cursor.execute(
-            """
-            SELECT sh.id, sh.query, sh.search_date, u.user_id, u.username, u.full_name
-            FROM search_history sh
-            JOIN users u ON sh.user_id = u.user_id
-            WHERE sh.id = ?
-            """,
-            (search_id,)
-        )
-        
-        row = self.cursor.fetchone()
-        if not row:
-            return None
-        
-        search_id, query, search_date, user_id, username, full_name = row
-        
-        # Получаем найденные шрифты для этого поиска
-        self.cursor.execute(
-            """
-            SELECT font_name, font_slug, designer, manufacturer, user_fullname, url, download_url
-            FROM found_fonts
-            WHERE search_id = ?
-            """,
-            (search_id,)
-        )
+            ).fetchall()
         
         fonts = []
-        for font_row in self.cursor.fetchall():
+        for font_row in font_rows:
             font_name, font_slug, designer, manufacturer, user_fullname, url, download_url = font_row
             fonts.append({
                 "font_name": font_name,
@@ -625,6 +631,7 @@ class Database:
             "id": search_id,
             "query": query,
             "search_date": search_date,
+            "is_fuzzy": bool(is_fuzzy),
             "user": {
                 "user_id": user_id,
                 "username": username,
@@ -633,137 +640,231 @@ class Database:
             "fonts": fonts
         }
     
-    def get_all_users(self) -> List[Dict[str, Any]]:
-        """Получение списка всех пользователей"""
-        self.cursor.execute(
-            """
-            SELECT user_id, username, full_name, is_admin, registration_date
-            FROM users
-            ORDER BY registration_date DESC
-            """
+    @staticmethod
+    def _user_row(row: Tuple) -> Dict[str, Any]:
+        user_id, username, full_name, is_admin, registration_date, search_count = row
+        return {
+            "user_id": user_id,
+            "username": username,
+            "full_name": full_name,
+            "is_admin": bool(is_admin),
+            "registration_date": registration_date,
+            "search_count": search_count
+        }
+    
+    @staticmethod
+    def _keyset(columns: str, key_query: str, older_than: Optional[int],
+                newer_than: Optional[int]) -> Tuple[str, str, Tuple]:
+        """
+        Условие, направление сортировки и параметры для пагинации по ключу.
+        key_query выбирает значения ключа записи, от которой берется страница.
+        """
+        if newer_than is not None:
+            return f"WHERE ({columns}) > ({key_query})", "ASC", (newer_than,)
+        if older_than is not None:
+            return f"WHERE ({columns}) < ({key_query})", "DESC", (older_than,)
+        return "", "DESC", ()
+    
+    @staticmethod
+    def _keyset_page(rows: List, limit: int, older_than: Optional[int],
+                     newer_than: Optional[int]) -> Tuple[List, bool, bool]:
+        """Страница от новых к старым и признаки наличия более старых и более новых записей"""
+        # Лишняя запись показывает, что в этом направлении есть еще страницы
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if newer_than is not None:
+            rows.reverse()
+            return rows, True, has_more
+        return rows, has_more, older_than is not None
+    
+    def get_users_page(self, limit: int = ADMIN_PAGE_SIZE, older_than: Optional[int] = None,
+                       newer_than: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Страница списка пользователей (от новых к старым) с количеством поисков.
+        Пагинация по ключу (registration_date, user_id): older_than/newer_than - ID пользователя,
+        от которого берется следующая или предыдущая страница. Количество поисков считается
+        одним группирующим JOIN только для пользователей страницы.
+        """
+        condition, order, params = self._keyset(
+            "registration_date, user_id",
+            "SELECT registration_date, user_id FROM users WHERE user_id = ?",
+            older_than, newer_than
         )
         
-        users = []
-        for row in self.cursor.fetchall():
-            user_id, username, full_name, is_admin, registration_date = row
-            
-            # Получаем количество поисков для этого пользователя
-            self.cursor.execute(
-                "SELECT COUNT(*) FROM search_history WHERE user_id = ?",
-                (user_id,)
-            )
-            search_count = self.cursor.fetchone()[0]
-            
-            users.append({
-                "user_id": user_id,
-                "username": username,
-                "full_name": full_name,
-                "is_admin": bool(is_admin),
-                "registration_date": registration_date,
-                "search_count": search_count
-            })
+        with self.connections.reader() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT page.user_id, page.username, page.full_name, page.is_admin,
+                       page.registration_date, COUNT(sh.id) AS search_count
+                FROM (
+                    SELECT user_id, username, full_name, is_admin, registration_date
+                    FROM users
+                    {condition}
+                    ORDER BY registration_date {order}, user_id {order}
+                    LIMIT ?
+                ) page
+                LEFT JOIN search_history sh ON sh.user_id = page.user_id
+                GROUP BY page.user_id
+                ORDER BY page.registration_date {order}, page.user_id {order}
+                """,
+                params + (limit + 1,)
+            ).fetchall()
         
-        return users
-    
-    def get_all_searches(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """Получение списка всех поисков"""
-        self.cursor.execute(
-            """
-            SELECT sh.id, sh.query, sh.search_date, u.user_id, u.username, u.full_name
-            FROM search_history sh
-            JOIN users u ON sh.user_id = u.user_id
-            ORDER BY sh.search_date DESC
-            LIMIT ?
-            """,
-            (limit,)
+        rows, has_older, has_newer = self._keyset_page(rows, limit, older_than, newer_than)
+        return {
+            "items": [self._user_row(row) for row in rows],
+            "has_older": has_older,
+            "has_newer": has_newer
+        }
+    
+    def get_searches_page(self, limit: int = ADMIN_PAGE_SIZE, older_than: Optional[int] = None,
+                          newer_than: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Страница списка всех поисков (от новых к старым) с количеством найденных шрифтов.
+        Пагинация по ключу (search_date, id), как в get_users_page.
+        """
+        condition, order, params = self._keyset(
+            "search_date, id",
+            "SELECT search_date, id FROM search_history WHERE id = ?",
+            older_than, newer_than
         )
         
-        searches = []
-        for row in self.cursor.fetchall():
-            search_id, query, search_date, user_id, username, full_name = row
-            
-            # Получаем количество найденных шрифтов для этого поиска
-            self.cursor.execute(
-                "SELECT COUNT(*) FROM found_fonts WHERE search_id = ?",
-                (search_id,)
-            )
-            font_count = self.cursor.fetchone()[0]
-            
-            searches.append({
-                "id": search_id,
-                "query": query,
-                "search_date": search_date,
-                "user": {
-                    "user_id": user_id,
-                    "username": username,
-                    "full_name": full_name
-                },
-                "font_count": font_count
-            })
+        with self.connections.reader() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT page.id, page.query, page.search_date, page.user_id, u.username, u.full_name,
+                       COUNT(ff.id) AS font_count
+                FROM (
+                    SELECT id, user_id, query, search_date
+                    FROM search_history
+                    {condition}
+                    ORDER BY search_date {order}, id {order}
+                    LIMIT ?
+                ) page
+                LEFT JOIN users u ON u.user_id = page.user_id
+                LEFT JOIN found_fonts ff ON ff.search_id = page.id
+                GROUP BY page.id
+                ORDER BY page.search_date {order}, page.id {order}
+                """,
+                params + (limit + 1,)
+            ).fetchall()
+        
+        rows, has_older, has_newer = self._keyset_page(rows, limit, older_than, newer_than)
+        return {
+            "items": [
+                {
+                    "id": search_id,
+                    "query": query,
+                    "search_date": search_date,
+                    "user": {
+                        "user_id": user_id,
+                        "username": username,
+                        "full_name": full_name
+                    },
+                    "font_count": font_count
+                }
+                for search_id, query, search_date, user_id, username, full_name, font_count in rows
+            ],
+            "has_older": has_older,
+            "has_newer": has_newer
+        }
+    
+    def get_cached_search(self, query_key: str, max_age: float) -> Optional[Tuple[str, float, bool]]:
+        """
+        Получение закешированных результатов поиска: JSON, возраст записи в секундах
+        и признак обрезанного ответа API (у старых записей неизвестен - считается обрезанным)
+        """
+        with self.connections.reader() as conn:
+            row = conn.execute(
+                "SELECT results, created_at, truncated FROM search_cache WHERE query_key = ?",
+                (query_key,)
+            ).fetchone()
+        if not row:
+            return None
+        
+        results, created_at, truncated = row
+        age = time.time() - created_at
+        if age >= max_age:
+            return None
         
-        return searches
+        return results, age, truncated is None or bool(truncated)
+    
+    def set_cached_search(self, query_key: str, results: str, truncated: bool = True) -> None:
+        """Сохранение результатов поиска в кеш"""
+        with self.connections.writer() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache (query_key, results, created_at, truncated) VALUES (?, ?, ?, ?)",
+                (query_key, results, time.time(), int(truncated))
+            )
+    
+    def purge_search_cache(self, max_age: float) -> int:
+        """Удаление устаревших записей кеша поиска"""
+        with self.connections.writer() as conn:
+            cursor = conn.execute(
+                "DELETE FROM search_cache WHERE created_at < ?",
+                (time.time() - max_age,)
+            )
+            return cursor.rowcount
+    
+    def get_fsm_record(self, storage_key: str, min_updated_at: float) -> Optional[Tuple[Optional[str], str, float]]:
+        """Состояние FSM, JSON его данных и время изменения, если запись менялась не раньше min_updated_at"""
+        with self.connections.reader() as conn:
+            return conn.execute(
+                "SELECT state, data, updated_at FROM fsm_storage WHERE storage_key = ? AND updated_at >= ?",
+                (storage_key, min_updated_at)
+            ).fetchone()
+    
+    def write_fsm_records(self, upserts: List[Tuple[str, Optional[str], str, float]], deletes: List[str]) -> None:
+        """Запись пачки изменений состояний FSM одной транзакцией"""
+        with self.connections.writer() as conn:
+            if upserts:
+                conn.executemany(
+                    """
+                    INSERT INTO fsm_storage (storage_key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(storage_key) DO UPDATE SET
+                        state = excluded.state,
+                        data = excluded.data,
+                        updated_at = excluded.updated_at
+                    """,
+                    upserts
+                )
+            if deletes:
+                conn.executemany("DELETE FROM fsm_storage WHERE storage_key = ?", [(key,) for key in deletes])
+    
+    def purge_fsm_records(self, min_updated_at: float) -> int:
+        """Удаление состояний FSM, не менявшихся с min_updated_at"""
+        with self.connections.writer() as conn:
+            return conn.execute("DELETE FROM fsm_storage WHERE updated_at < ?", (min_updated_at,)).rowcount
     
     def close(self):
-        """Закрытие соединения с базой данных"""
-        self.connection.close()
+        """Закрытие соединений с базой данных"""
+        self.connections.close()
 
-    def add_local_font(self, font_name, font_slug, file_path, designer=None, manufacturer=None, user_fullname=None, url=None):
-        """Добавление шрифта в локальную базу данных"""
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
+    def get_font_names(self) -> List[Tuple[int, str]]:
+        """ID и названия всех локальных шрифтов (для построения индекса нечеткого поиска)"""
+        with self.connections.reader() as conn:
+            return conn.execute("SELECT id, font_name FROM local_fonts").fetchall()
+
+    def get_local_fonts_by_ids(self, font_ids: List[int]) -> List[Dict[str, Any]]:
+        """Получение шрифтов локальной базы по списку ID"""
+        if not font_ids:
+            return []
+        with self.connections.reader() as conn:
             cursor = conn.cursor()
-            
-            # Проверяем, есть ли уже такой шрифт в базе
-            cursor.execute('SELECT id FROM local_fonts WHERE font_slug = ?', (font_slug,))
-            existing_font = cursor.fetchone()
-            
-            added_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            if existing_font:
-                # Если шрифт уже есть, обновляем информацию
-                cursor.execute('''
-                    UPDATE local_fonts 
-                    SET file_path = ?, designer = ?, manufacturer = ?, user_fullname = ?, url = ?
-                    WHERE font_slug = ?
-                ''', (file_path, designer, manufacturer, user_fullname, url, font_slug))
-                
-                font_id = existing_font[0]
-                logging.info(f"Обновлена информация о шрифте {font_name} (slug: {font_slug}) в локальной базе")
-            else:
-                # Если шрифта нет, добавляем новый
-                cursor.execute('''
-                    INSERT INTO local_fonts 
-                    (font_name, font_slug, file_path, designer, manufacturer, user_fullname, url, added_date, download_count)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
-                ''', (font_name, font_slug, file_path, designer, manufacturer, user_fullname, url, added_date))
-                
-                font_id = cursor.lastrowid
-                
-                # Обновляем счетчик шрифтов в статистике
-                cursor.execute('UPDATE font_stats SET total_fonts = total_fonts + 1 WHERE id = 1')
-                
-                logging.info(f"Добавлен новый шрифт {font_name} (slug: {font_slug}) в локальную базу")
-            
-            conn.commit()
-            return font_id
-        except Exception as e:
-            logging.error(f"Ошибка при добавлении шрифта в локальную базу: {e}")
-            return None
-        finally:
-            if conn:
-                conn.close()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(
+                f"SELECT * FROM local_fonts WHERE id IN ({', '.join('?' * len(font_ids))})",
+                font_ids
+            )
+            return [dict(row) for row in cursor.fetchall()]
 
     def get_local_font_by_slug(self, font_slug):
         """Получение информации о шрифте из локальной базы по slug"""
-        conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM local_fonts WHERE font_slug = ?', (font_slug,))
-            font = cursor.fetchone()
+            with self.connections.reader() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
+                font = cursor.execute('SELECT * FROM local_fonts WHERE font_slug = ?', (font_slug,)).fetchone()
             
             if font:
                 return dict(font)
@@ -772,109 +873,25 @@ class Database:
         except Exception as e:
             logging.error(f"Ошибка при получении информации о шрифте: {e}")
             return None
-        finally:
-            if conn:
-                conn.close()
 
-    def increment_font_downloads(self, font_slug):
-        """Увеличение счетчика загрузок шрифта"""
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Обновляем счетчик загрузок для конкретного шрифта
-            cursor.execute('UPDATE local_fonts SET download_count = download_count + 1 WHERE font_slug = ?', (font_slug,))
-            
-            # Обновляем общий счетчик загрузок
-            cursor.execute('UPDATE font_stats SET total_downloads = total_downloads + 1 WHERE id = 1')
-            
-            conn.commit()
-            logging.info(f"Увеличен счетчик загрузок для шрифта {font_slug}")
-            return True
-        except Exception as e:
-            logging.error(f"Ошибка при обновлении счетчика загрузок: {e}")
-            return False
-        finally:
-            if conn:
-                conn.close()
+    def _count(self, column: str) -> int:
+        """Чтение счетчика из строки dashboard_stats, поддерживаемой триггерами"""
+        with self.connections.reader() as conn:
+            row = conn.execute(f"SELECT {column} FROM dashboard_stats WHERE id = 1").fetchone()
+        return row[0] if row else 0
 
     def get_user_count(self):
         """Получение количества пользователей"""
-        conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM users')
-            count = cursor.fetchone()[0]
-            return count
+            return self._count('user_count')
         except Exception as e:
             logging.error(f"Ошибка при получении количества пользователей: {e}")
             return 0
-        finally:
-            if conn:
-                conn.close()
-
-    def get_admin_count(self):
-        """Получение количества администраторов"""
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM users WHERE is_admin = 1')
-            count = cursor.fetchone()[0]
-            return count
-        except Exception as e:
-            logging.error(f"Ошибка при получении количества администраторов: {e}")
-            return 0
-        finally:
-            if conn:
-                conn.close()
 
     def get_search_count(self):
         """Получение количества поисков"""
-        conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM search_history')
-            count = cursor.fetchone()[0]
-            return count
+            return self._count('search_count')
         except Exception as e:
             logging.error(f"Ошибка при получении количества поисков: {e}")
             return 0
-        finally:
-            if conn:
-                conn.close()
-
-    def get_font_count(self):
-        """Получение количества шрифтов в локальной базе"""
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM local_fonts')
-            count = cursor.fetchone()[0]
-            return count
-        except Exception as e:
-            logging.error(f"Ошибка при получении количества шрифтов: {e}")
-            return 0
-        finally:
-            if conn:
-                conn.close()
-
-    def get_document_count(self):
-        """Получение количества документов"""
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT document_count FROM font_stats WHERE id = 1')
-            count = cursor.fetchone()[0]
-            return count
-        except Exception as e:
-            logging.error(f"Ошибка при получении количества документов: {e}")
-            return 0
-        finally:
-            if conn:
-                conn.close() 
\ No newline at end of file
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from config import FSM_STATE_TTL, FSM_CACHE_SIZE, FSM_FLUSH_INTERVAL, FSM_BATCH_SIZE, FSM_SWEEP_INTERVAL
+from utils.lru_cache import LRUCache
+
+# Состояние и данные пользователя
+Record = Tuple[Optional[str], Dict[str, Any]]
+
+_EMPTY: Record = (None, {})
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в SQLite: диалоги переживают перезапуск бота.
+    Чтение идет через ограниченный LRU-кеш, записи копятся в памяти и сохраняются пачками,
+    а состояния, не менявшиеся дольше state_ttl, удаляются фоновой очисткой.
+    Данные состояния должны сериализоваться в JSON.
+    """
+
+    def __init__(self, db, state_ttl: float = FSM_STATE_TTL, cache_size: int = FSM_CACHE_SIZE,
+                 flush_interval: float = FSM_FLUSH_INTERVAL, batch_size: int = FSM_BATCH_SIZE,
+                 sweep_interval: float = FSM_SWEEP_INTERVAL, key_builder: Optional[KeyBuilder] = None):
+        self._db = db
+        self.state_ttl = state_ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.sweep_interval = sweep_interval
+        self._key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._cache = LRUCache(maxsize=cache_size, ttl=state_ttl)
+        # Несохраненные изменения: ключ -> (состояние, JSON данных, время изменения) или None для удаления
+        self._dirty: Dict[str, Optional[Tuple[Optional[str], str, float]]] = {}
+        # Изменения, которые записываются прямо сейчас (видны при чтении до фиксации)
+        self._flushing: Dict[str, Optional[Tuple[Optional[str], str, float]]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_sweep = time.monotonic()
+        self.flushed = 0
+        self.expired = 0
+
+    async def start(self) -> None:
+        """Запуск фоновой записи и очистки (вызывается при запуске диспетчера)"""
+        if self._task is None:
+            expired = await self._db.purge_fsm_records(time.time() - self.state_ttl)
+            self.expired += expired
+            self._task = asyncio.create_task(self._run(), name="fsm-storage")
+
+    async def close(self) -> None:
+        """Остановка фоновой задачи и запись оставшихся изменений"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self._key_builder.build(key)
+        _, data = await self._get(storage_key)
+        self._put(storage_key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._get(self._key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = self._key_builder.build(key)
+        state, _ = await self._get(storage_key)
+        self._put(storage_key, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._get(self._key_builder.build(key))
+        return data.copy()
+
+    async def _get(self, storage_key: str) -> Record:
+        record = self._cache.get(storage_key)
+        if record is not None:
+            return record
+
+        # Запись могла быть вытеснена из кеша раньше, чем сохранена
+        for pending in (self._dirty, self._flushing):
+            if storage_key in pending:
+                entry = pending[storage_key]
+                if entry is None:
+                    return self._cache_record(storage_key, _EMPTY)
+                return self._cache_record(storage_key, (entry[0], json.loads(entry[1])), entry[2])
+
+        row = await self._db.get_fsm_record(storage_key, time.time() - self.state_ttl)
+
+        # Пока шло чтение, состояние могло измениться
+        record = self._cache.peek(storage_key)
+        if record is not None:
+            return record
+
+        if row is None:
+            return self._cache_record(storage_key, _EMPTY)
+        return self._cache_record(storage_key, (row[0], json.loads(row[1])), row[2])
+
+    def _cache_record(self, storage_key: str, record: Record, updated_at: Optional[float] = None) -> Record:
+        """
+        Кеширование прочитанного состояния. Срок жизни отсчитывается от последнего изменения,
+        а не от чтения: чтение не продлевает жизнь неактивного состояния.
+        """
+        if updated_at is None:
+            self._cache.set(storage_key, record)
+            return record
+
+        remaining = updated_at + self.state_ttl - time.time()
+        if remaining <= 0:
+            # Состояние устарело, пока шло чтение
+            self._cache.set(storage_key, _EMPTY)
+            return _EMPTY
+        self._cache.set(storage_key, record, ttl=remaining)
+        return record
+
+    def _put(self, storage_key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        if state is None and not data:
+            entry = None
+        else:
+            # Сериализуем сразу, чтобы ошибка возникла в обработчике, а не при записи
+            entry = (state, json.dumps(data, ensure_ascii=False), time.time())
+
+        self._cache.set(storage_key, (state, data))
+        self._dirty[storage_key] = entry
+        if len(self._dirty) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+            if time.monotonic() - self._last_sweep >= self.sweep_interval:
+                self._last_sweep = time.monotonic()
+                try:
+                    expired = await self._db.purge_fsm_records(time.time() - self.state_ttl)
+                    self.expired += expired
+                    if expired:
+                        logging.info(f"Удалено {expired} устаревших состояний FSM")
+                except Exception as e:
+                    logging.error(f"Ошибка при очистке состояний FSM: {e}")
+
+    async def flush(self) -> None:
+        """Запись накопленных изменений одной транзакцией"""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+
+            self._flushing, self._dirty = self._dirty, {}
+            upserts = [
+                (storage_key, entry[0], entry[1], entry[2])
+                for storage_key, entry in self._flushing.items() if entry is not None
+            ]
+            deletes = [storage_key for storage_key, entry in self._flushing.items() if entry is None]
+
+            try:
+                await self._db.write_fsm_records(upserts, deletes)
+                self.flushed += len(self._flushing)
+            except Exception as e:
+                logging.error(f"Ошибка при записи состояний FSM: {e}")
+                # Возвращаем изменения, не затирая более свежие
+                for storage_key, entry in self._flushing.items():
+                    self._dirty.setdefault(storage_key, entry)
+            finally:
+                self._flushing = {}
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики хранилища для админ-панели"""
+        return {
+            "cached": len(self._cache),
+            "pending": len(self._dirty),
+            "flushed": self.flushed,
+            "expired": self.expired
+        }
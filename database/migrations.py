@@ -0,0 +1,438 @@
+import logging
+import sqlite3
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+
+class Migration(NamedTuple):
+    """Шаг изменения схемы базы данных"""
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+    """Добавление столбца в существующую таблицу, если его еще нет"""
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _initial_schema(conn: sqlite3.Connection) -> None:
+    """Таблицы бота (для баз, созданных до появления миграций, только недостающее)"""
+    # Таблица пользователей
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        full_name TEXT,
+        is_admin INTEGER DEFAULT 0,
+        registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    # Таблица истории поиска
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS search_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        query TEXT,
+        search_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    )
+    """)
+
+    # Таблица найденных шрифтов
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS found_fonts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        search_id INTEGER,
+        font_name TEXT,
+        font_slug TEXT,
+        designer TEXT,
+        manufacturer TEXT,
+        user_fullname TEXT,
+        url TEXT,
+        download_url TEXT,
+        FOREIGN KEY (search_id) REFERENCES search_history (id)
+    )
+    """)
+
+    # Таблица локальных шрифтов (кеш)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS local_fonts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        font_name TEXT,
+        font_slug TEXT,
+        designer TEXT,
+        manufacturer TEXT,
+        user_fullname TEXT,
+        url TEXT,
+        download_url TEXT,
+        file_path TEXT,
+        added_by_user_id INTEGER,
+        added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        download_count INTEGER DEFAULT 0,
+        is_document BOOLEAN DEFAULT 0,
+        FOREIGN KEY (added_by_user_id) REFERENCES users (user_id)
+    )
+    """)
+
+    # Таблица статистики по локальным шрифтам
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS font_stats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        total_fonts INTEGER DEFAULT 0,
+        total_documents INTEGER DEFAULT 0,
+        local_searches INTEGER DEFAULT 0,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    # Таблица логов поиска в локальной базе
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS local_search_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        query TEXT,
+        results_count INTEGER,
+        search_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    )
+    """)
+
+    # Таблица кеша результатов автодополнения
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS search_cache (
+        query_key TEXT PRIMARY KEY,
+        results TEXT,
+        created_at REAL
+    )
+    """)
+
+    # Хеш содержимого файла шрифта в контентно-адресуемом хранилище
+    _ensure_column(conn, "local_fonts", "content_hash", "TEXT")
+
+    # file_id последней отправки файла шрифта в Telegram
+    _ensure_column(conn, "local_fonts", "telegram_file_id", "TEXT")
+
+    # Вставляем начальную запись в таблицу статистики, если она пуста
+    if conn.execute("SELECT COUNT(*) FROM font_stats").fetchone()[0] == 0:
+        conn.execute("INSERT INTO font_stats (total_fonts, total_documents, local_searches) VALUES (0, 0, 0)")
+
+
+def _add_indexes(conn: sqlite3.Connection) -> None:
+    """Индексы для частых запросов и уникальность slug локальных шрифтов"""
+    # Перед созданием уникального индекса удаляем дубликаты slug (остается первая запись)
+    removed = conn.execute(
+        "DELETE FROM local_fonts WHERE id NOT IN (SELECT MIN(id) FROM local_fonts GROUP BY font_slug)"
+    ).rowcount
+    if removed:
+        conn.execute("UPDATE font_stats SET total_fonts = total_fonts - ?", (removed,))
+        logging.warning(f"Удалено {removed} дубликатов шрифтов в локальной базе")
+
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_local_fonts_slug ON local_fonts (font_slug)")
+
+    # История пользователя: фильтр по user_id с сортировкой по дате
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_search_history_user_date ON search_history (user_id, search_date)"
+    )
+
+    # Шрифты конкретного поиска
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_found_fonts_search ON found_fonts (search_id)")
+
+    # Популярные запросы локального поиска
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_local_search_logs_query ON local_search_logs (query)")
+
+    # Обновляем статистику для планировщика запросов
+    conn.execute("ANALYZE")
+
+
+def _add_font_search_index(conn: sqlite3.Connection) -> None:
+    """Полнотекстовый индекс FTS5 для поиска по локальной базе шрифтов"""
+    # Внешнее содержимое: индекс хранит только токены, сами данные остаются в local_fonts
+    conn.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS local_fonts_fts USING fts5(
+        font_name, font_slug, designer, manufacturer,
+        content = 'local_fonts',
+        content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """)
+
+    # Триггеры поддерживают индекс в актуальном состоянии
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS local_fonts_fts_insert AFTER INSERT ON local_fonts BEGIN
+        INSERT INTO local_fonts_fts (rowid, font_name, font_slug, designer, manufacturer)
+        VALUES (new.id, new.font_name, new.font_slug, new.designer, new.manufacturer);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS local_fonts_fts_delete AFTER DELETE ON local_fonts BEGIN
+        INSERT INTO local_fonts_fts (local_fonts_fts, rowid, font_name, font_slug, designer, manufacturer)
+        VALUES ('delete', old.id, old.font_name, old.font_slug, old.designer, old.manufacturer);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS local_fonts_fts_update
+    AFTER UPDATE OF font_name, font_slug, designer, manufacturer ON local_fonts BEGIN
+        INSERT INTO local_fonts_fts (local_fonts_fts, rowid, font_name, font_slug, designer, manufacturer)
+        VALUES ('delete', old.id, old.font_name, old.font_slug, old.designer, old.manufacturer);
+        INSERT INTO local_fonts_fts (rowid, font_name, font_slug, designer, manufacturer)
+        VALUES (new.id, new.font_name, new.font_slug, new.designer, new.manufacturer);
+    END
+    """)
+
+    # Индексируем уже существующие шрифты
+    conn.execute("INSERT INTO local_fonts_fts (local_fonts_fts) VALUES ('rebuild')")
+
+
+def _add_admin_list_indexes(conn: sqlite3.Connection) -> None:
+    """Индексы для постраничных списков пользователей и поисков в админ-панели"""
+    # Ключ пагинации (дата, ID): ID - это rowid, он уже входит в индекс
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_registration ON users (registration_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_search_history_date ON search_history (search_date)")
+    conn.execute("ANALYZE")
+
+
+def _add_dashboard_stats(conn: sqlite3.Connection) -> None:
+    """
+    Статистика админ-панели, поддерживаемая триггерами: одна строка dashboard_stats
+    и счетчики запросов и пользователей локального поиска вместо font_stats
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS dashboard_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        user_count INTEGER NOT NULL DEFAULT 0,
+        admin_count INTEGER NOT NULL DEFAULT 0,
+        search_count INTEGER NOT NULL DEFAULT 0,
+        font_count INTEGER NOT NULL DEFAULT 0,
+        document_count INTEGER NOT NULL DEFAULT 0,
+        download_count INTEGER NOT NULL DEFAULT 0,
+        local_search_count INTEGER NOT NULL DEFAULT 0,
+        local_search_results INTEGER NOT NULL DEFAULT 0,
+        local_search_users INTEGER NOT NULL DEFAULT 0,
+        local_search_queries INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
+    # Количество локальных поисков по каждому запросу и каждому пользователю
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS local_query_counts (
+        query TEXT PRIMARY KEY,
+        count INTEGER NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_local_query_counts_count ON local_query_counts (count)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS local_search_user_counts (
+        user_id INTEGER PRIMARY KEY,
+        count INTEGER NOT NULL
+    )
+    """)
+
+    # Заполняем по уже накопленным данным
+    conn.execute("DELETE FROM local_query_counts")
+    conn.execute(
+        "INSERT INTO local_query_counts (query, count) "
+        "SELECT query, COUNT(*) FROM local_search_logs WHERE query IS NOT NULL GROUP BY query"
+    )
+    conn.execute("DELETE FROM local_search_user_counts")
+    conn.execute(
+        "INSERT INTO local_search_user_counts (user_id, count) "
+        "SELECT user_id, COUNT(*) FROM local_search_logs WHERE user_id IS NOT NULL GROUP BY user_id"
+    )
+    conn.execute("""
+    INSERT OR REPLACE INTO dashboard_stats
+    SELECT 1,
+        (SELECT COUNT(*) FROM users),
+        (SELECT COUNT(*) FROM users WHERE is_admin = 1),
+        (SELECT COUNT(*) FROM search_history),
+        (SELECT COUNT(*) FROM local_fonts),
+        (SELECT COUNT(*) FROM local_fonts WHERE is_document = 1),
+        (SELECT COALESCE(SUM(download_count), 0) FROM local_fonts),
+        (SELECT COUNT(*) FROM local_search_logs),
+        (SELECT COALESCE(SUM(results_count), 0) FROM local_search_logs),
+        (SELECT COUNT(*) FROM local_search_user_counts),
+        (SELECT COUNT(*) FROM local_query_counts)
+    """)
+
+    triggers = {
+        "dashboard_users_insert": """
+            AFTER INSERT ON users BEGIN
+                UPDATE dashboard_stats SET user_count = user_count + 1,
+                    admin_count = admin_count + (new.is_admin = 1);
+            END""",
+        "dashboard_users_delete": """
+            AFTER DELETE ON users BEGIN
+                UPDATE dashboard_stats SET user_count = user_count - 1,
+                    admin_count = admin_count - (old.is_admin = 1);
+            END""",
+        "dashboard_users_admin": """
+            AFTER UPDATE OF is_admin ON users BEGIN
+                UPDATE dashboard_stats SET admin_count = admin_count + (new.is_admin = 1) - (old.is_admin = 1);
+            END""",
+        "dashboard_searches_insert": """
+            AFTER INSERT ON search_history BEGIN
+                UPDATE dashboard_stats SET search_count = search_count + 1;
+            END""",
+        "dashboard_searches_delete": """
+            AFTER DELETE ON search_history BEGIN
+                UPDATE dashboard_stats SET search_count = search_count - 1;
+            END""",
+        "dashboard_fonts_insert": """
+            AFTER INSERT ON local_fonts BEGIN
+                UPDATE dashboard_stats SET font_count = font_count + 1,
+                    document_count = document_count + (new.is_document = 1),
+                    download_count = download_count + COALESCE(new.download_count, 0);
+            END""",
+        "dashboard_fonts_delete": """
+            AFTER DELETE ON local_fonts BEGIN
+                UPDATE dashboard_stats SET font_count = font_count - 1,
+                    document_count = document_count - (old.is_document = 1),
+                    download_count = download_count - COALESCE(old.download_count, 0);
+            END""",
+        "dashboard_fonts_update": """
+            AFTER UPDATE OF is_document, download_count ON local_fonts BEGIN
+                UPDATE dashboard_stats SET
+                    document_count = document_count + (new.is_document = 1) - (old.is_document = 1),
+                    download_count = download_count
+                        + COALESCE(new.download_count, 0) - COALESCE(old.download_count, 0);
+            END""",
+        # Число уникальных запросов и пользователей растет, когда счетчик создается впервые
+        "dashboard_local_searches_insert": """
+            AFTER INSERT ON local_search_logs BEGIN
+                UPDATE dashboard_stats SET
+                    local_search_count = local_search_count + 1,
+                    local_search_results = local_search_results + COALESCE(new.results_count, 0),
+                    local_search_queries = local_search_queries + (new.query IS NOT NULL
+                        AND NOT EXISTS (SELECT 1 FROM local_query_counts WHERE query = new.query)),
+                    local_search_users = local_search_users + (new.user_id IS NOT NULL
+                        AND NOT EXISTS (SELECT 1 FROM local_search_user_counts WHERE user_id = new.user_id));
+                INSERT INTO local_query_counts (query, count) SELECT new.query, 1 WHERE new.query IS NOT NULL
+                    ON CONFLICT (query) DO UPDATE SET count = count + 1;
+                INSERT INTO local_search_user_counts (user_id, count) SELECT new.user_id, 1 WHERE new.user_id IS NOT NULL
+                    ON CONFLICT (user_id) DO UPDATE SET count = count + 1;
+            END""",
+        "dashboard_local_searches_delete": """
+            AFTER DELETE ON local_search_logs BEGIN
+                UPDATE local_query_counts SET count = count - 1 WHERE query = old.query;
+                UPDATE local_search_user_counts SET count = count - 1 WHERE user_id = old.user_id;
+                UPDATE dashboard_stats SET
+                    local_search_count = local_search_count - 1,
+                    local_search_results = local_search_results - COALESCE(old.results_count, 0),
+                    local_search_queries = local_search_queries
+                        - EXISTS (SELECT 1 FROM local_query_counts WHERE query = old.query AND count <= 0),
+                    local_search_users = local_search_users
+                        - EXISTS (SELECT 1 FROM local_search_user_counts WHERE user_id = old.user_id AND count <= 0);
+                DELETE FROM local_query_counts WHERE query = old.query AND count <= 0;
+                DELETE FROM local_search_user_counts WHERE user_id = old.user_id AND count <= 0;
+            END""",
+    }
+    for name, body in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+    # Старая таблица статистики поддерживалась вручную и расходилась с данными
+    conn.execute("DROP TABLE IF EXISTS font_stats")
+
+
+def _add_fsm_storage(conn: sqlite3.Connection) -> None:
+    """Таблица состояний FSM, чтобы диалоги переживали перезапуск бота"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS fsm_storage (
+        storage_key TEXT PRIMARY KEY,
+        state TEXT,
+        data TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """)
+    # Фоновая очистка устаревших состояний
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fsm_storage_updated ON fsm_storage (updated_at)")
+
+
+def _add_search_fuzzy_flag(conn: sqlite3.Connection) -> None:
+    """Признак поиска, результаты которого - похожие названия из локальной базы (опечатка в запросе)"""
+    conn.execute("ALTER TABLE search_history ADD COLUMN is_fuzzy INTEGER NOT NULL DEFAULT 0")
+
+
+def _add_search_cache_truncated(conn: sqlite3.Connection) -> None:
+    """Признак обрезанного лимитом ответа API в кеше поиска (NULL у старых записей)"""
+    conn.execute("ALTER TABLE search_cache ADD COLUMN truncated INTEGER")
+
+
+def _add_search_cache_created_index(conn: sqlite3.Connection) -> None:
+    """Индекс времени записи кеша поиска: периодическая очистка удаляет устаревшие записи без полного просмотра"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_created ON search_cache (created_at)")
+
+
+# Миграции применяются строго по возрастанию версии; примененные миграции не изменяются
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Начальная схема", _initial_schema),
+    Migration(2, "Индексы и уникальный slug шрифтов", _add_indexes),
+    Migration(3, "Полнотекстовый поиск по локальным шрифтам", _add_font_search_index),
+    Migration(4, "Индексы списков админ-панели", _add_admin_list_indexes),
+    Migration(5, "Статистика админ-панели на триггерах", _add_dashboard_stats),
+    Migration(6, "Хранилище состояний FSM", _add_fsm_storage),
+    Migration(7, "Признак нечеткого поиска в истории", _add_search_fuzzy_flag),
+    Migration(8, "Признак обрезанного ответа в кеше поиска", _add_search_cache_truncated),
+    Migration(9, "Индекс очистки кеша поиска", _add_search_cache_created_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы (0 - база без таблицы версий)"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not exists:
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: Optional[int] = None) -> int:
+    """
+    Применение недостающих миграций до версии target (по умолчанию - последней).
+    Каждая миграция выполняется в своей транзакции. Возвращает итоговую версию схемы.
+    """
+    target = LATEST_VERSION if target is None else target
+    version = get_schema_version(conn)
+    if version >= target:
+        return version
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.commit()
+
+    for migration in MIGRATIONS:
+        if migration.version <= version or migration.version > target:
+            continue
+
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN")
+            migration.apply(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (migration.version, migration.description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logging.error(f"Ошибка при применении миграции {migration.version}: {migration.description}")
+            raise
+
+        version = migration.version
+        logging.info(
+            f"Применена миграция {version}: {migration.description} "
+            f"({time.perf_counter() - started:.2f} с)"
+        )
+
+    return version
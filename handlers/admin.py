@@ -1,5 +1,5 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -8,22 +8,23 @@ from keyboards.admin import (
     get_user_info_keyboard, get_local_fonts_keyboard, get_font_info_keyboard
 )
 from keyboards.main_menu import get_main_menu_keyboard
-from config import ADMIN_IDS
+from config import ADMIN_PAGE_SIZE
+from services.font_store import font_store
+from services.font_delivery import send_by_file_id
+from services.downloader import status_progress, DownloadError
+from services.font_downloads import font_downloads
+from services.download_queue import download_queue, status_position, DownloadQueueFull, UserDownloadLimit
+from services.search_cache import search_cache
+from services.result_store import result_store
+from services.admin_registry import admin_registry
+from database.analytics import analytics
+from services.fuzzy_index import fuzzy_search_fonts
 import datetime
 import os
 import logging
-import aiohttp
-import aiofiles
-import uuid
 
 router = Router()
 
-# Папка для сохранения шрифтов
-FONTS_DIR = "fonts"
-
-# Создаем папку, если она не существует
-os.makedirs(FONTS_DIR, exist_ok=True)
-
 class AdminAction(StatesGroup):
     waiting_for_user_id = State()
     waiting_for_font_search = State()
@@ -32,6 +33,10 @@ def register_admin_handlers(dp, db):
     # Сохраняем базу данных в атрибуте роутера
     router.db = db
     
+    # Проверка прав администратора для всех обработчиков роутера
+    router.message.middleware(AdminGuardMiddleware())
+    router.callback_query.middleware(AdminGuardMiddleware())
+    
     # Добавляем middleware для передачи db в обработчики
     router.message.middleware(DbMiddleware(db))
     router.callback_query.middleware(DbMiddleware(db))
@@ -47,21 +52,24 @@ class DbMiddleware:
         data["db"] = self.db
         return await handler(event, data)
 
+class AdminGuardMiddleware:
+    """Пропускает к обработчикам админ-панели только администраторов (проверка по множеству в памяти)"""
+    
+    async def __call__(self, handler, event, data):
+        if not admin_registry.is_admin(event.from_user.id):
+            # Для сообщения - ответное сообщение, для нажатия кнопки - всплывающее уведомление
+            await event.answer("У вас нет доступа к админ-панели.")
+            return None
+        return await handler(event, data)
+
 # Проверка на администратора
 def is_admin_filter(message):
-    return message.from_user.id in ADMIN_IDS
+    return admin_registry.is_admin(message.from_user.id)
 
 @router.message(Command("admin"))
 async def cmd_admin(message: Message, db):
-    user_id = message.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await message.answer("У вас нет доступа к админ-панели.")
-        return
-    
-    # Устанавливаем пользователя как администратора в базе данных
-    db.set_admin(user_id, True)
+    # Администратор из настроек отмечается в базе только при первом входе
+    await admin_registry.ensure_persisted(message.from_user.id)
     
     await message.answer(
         "👑 Админ-панель\n\n"
@@ -71,13 +79,6 @@ async def cmd_admin(message: Message, db):
 
 @router.callback_query(F.data == "admin")
 async def show_admin_panel(callback: CallbackQuery, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
     await callback.message.edit_text(
         "👑 Админ-панель\n\n"
         "Выберите действие:",
@@ -85,108 +86,94 @@ async def show_admin_panel(callback: CallbackQuery, db):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "admin_users")
-async def show_users(callback: CallbackQuery, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
-    # Получаем список пользователей
-    users = db.get_all_users()
+def parse_page_callback(data):
+    """
+    Разбор callback_data навигации вида admin_users_page_<страница>_<older|newer>_<ID>.
+    Возвращает номер страницы и аргументы older_than/newer_than для запроса страницы.
+    """
+    parts = data.split("_")
+    if len(parts) != 6 or not parts[3].isdigit() or not parts[5].isdigit():
+        return None
+    
+    page, direction, key = int(parts[3]), parts[4], int(parts[5])
+    if direction == "older":
+        return page, {"older_than": key}
+    if direction == "newer":
+        return page, {"newer_than": key}
+    return None
+
+async def render_users_page(callback: CallbackQuery, db, page=1, **cursor):
+    """Вывод страницы списка пользователей"""
+    users_page = await db.get_users_page(ADMIN_PAGE_SIZE, **cursor)
+    total = await db.get_user_count()
+    total_pages = max((total + ADMIN_PAGE_SIZE - 1) // ADMIN_PAGE_SIZE, 1)
     
     await callback.message.edit_text(
         "👥 Пользователи\n\n"
-        f"Всего пользователей: {len(users)}",
-        reply_markup=get_users_keyboard(users)
+        f"Всего пользователей: {total}",
+        reply_markup=get_users_keyboard(
+            users_page["items"], page, total_pages, users_page["has_older"], users_page["has_newer"]
+        )
     )
     await callback.answer()
 
+@router.callback_query(F.data == "admin_users")
+async def show_users(callback: CallbackQuery, db):
+    await render_users_page(callback, db)
+
 @router.callback_query(F.data.startswith("admin_users_page_"))
 async def navigate_users(callback: CallbackQuery, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
+    # Получаем номер страницы и ключ соседней страницы
+    parsed = parse_page_callback(callback.data)
+    if parsed is None:
+        await callback.answer()
         return
     
-    # Получаем номер страницы
-    page = int(callback.data.split("_")[3])
-    
-    # Получаем список пользователей
-    users = db.get_all_users()
+    page, cursor = parsed
+    await render_users_page(callback, db, page, **cursor)
+
+async def render_searches_page(callback: CallbackQuery, db, page=1, **cursor):
+    """Вывод страницы списка поисковых запросов"""
+    searches_page = await db.get_searches_page(ADMIN_PAGE_SIZE, **cursor)
+    total = await db.get_search_count()
+    total_pages = max((total + ADMIN_PAGE_SIZE - 1) // ADMIN_PAGE_SIZE, 1)
     
     await callback.message.edit_text(
-        "👥 Пользователи\n\n"
-        f"Всего пользователей: {len(users)}",
-        reply_markup=get_users_keyboard(users, page)
+        "🔍 Поисковые запросы\n\n"
+        f"Всего запросов: {total}",
+        reply_markup=get_searches_keyboard(
+            searches_page["items"], page, total_pages, searches_page["has_older"], searches_page["has_newer"]
+        )
     )
     await callback.answer()
 
 @router.callback_query(F.data == "admin_searches")
 async def show_searches(callback: CallbackQuery, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
-    # Получаем список поисковых запросов
-    searches = db.get_all_searches()
-    
-    await callback.message.edit_text(
-        "🔍 Поисковые запросы\n\n"
-        f"Всего запросов: {len(searches)}",
-        reply_markup=get_searches_keyboard(searches)
-    )
-    await callback.answer()
+    await render_searches_page(callback, db)
 
 @router.callback_query(F.data.startswith("admin_searches_page_"))
 async def navigate_searches(callback: CallbackQuery, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
+    # Получаем номер страницы и ключ соседней страницы
+    parsed = parse_page_callback(callback.data)
+    if parsed is None:
+        await callback.answer()
         return
     
-    # Получаем номер страницы
-    page = int(callback.data.split("_")[3])
-    
-    # Получаем список поисковых запросов
-    searches = db.get_all_searches()
-    
-    await callback.message.edit_text(
-        "🔍 Поисковые запросы\n\n"
-        f"Всего запросов: {len(searches)}",
-        reply_markup=get_searches_keyboard(searches, page)
-    )
-    await callback.answer()
+    page, cursor = parsed
+    await render_searches_page(callback, db, page, **cursor)
 
 @router.callback_query(F.data.startswith("admin_user_"))
 async def show_user_info(callback: CallbackQuery, db):
-    admin_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if admin_id not in ADMIN_IDS and not db.is_admin(admin_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
+    # Префикс admin_user_ совпадает с кнопкой истории пользователя
+    if callback.data.startswith("admin_user_history_"):
+        await show_user_history(callback, db)
         return
     
-    # Получаем ID пользователя
-    user_id = int(callback.data.split("_")[2])
+    # Получаем ID пользователя (ID последний, т.к. сюда же приходит admin_make_admin_<ID>)
+    user_id = int(callback.data.split("_")[-1])
     
     # Получаем информацию о пользователе
-    users = db.get_all_users()
-    user_info = None
-    
-    for user in users:
-        if user["user_id"] == user_id:
-            user_info = user
-            break
+    user_info = await db.get_user_by_id(user_id)
     
     if not user_info:
         await callback.answer("Пользователь не найден.")
@@ -218,13 +205,6 @@ async def show_user_info(callback: CallbackQuery, db):
 
 @router.callback_query(F.data.startswith("admin_search_"))
 async def show_search_info(callback: CallbackQuery, state: FSMContext, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
     # Проверяем, является ли это запросом на поиск локальных шрифтов
     if callback.data == "admin_search_local_fonts":
         await search_local_fonts_prompt(callback, state)
@@ -234,7 +214,7 @@ async def show_search_info(callback: CallbackQuery, state: FSMContext, db):
     search_id = int(callback.data.split("_")[2])
     
     # Получаем информацию о поиске
-    search_details = db.get_search_details(search_id)
+    search_details = await db.get_search_details(search_id)
     
     if not search_details:
         await callback.answer("Информация о поиске не найдена.")
@@ -284,18 +264,11 @@ async def show_search_info(callback: CallbackQuery, state: FSMContext, db):
 
 @router.callback_query(F.data.startswith("admin_user_history_"))
 async def show_user_history(callback: CallbackQuery, db):
-    admin_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if admin_id not in ADMIN_IDS and not db.is_admin(admin_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
     # Получаем ID пользователя
     user_id = int(callback.data.split("_")[3])
     
-    # Получаем историю поиска пользователя
-    history = db.get_user_search_history(user_id)
+    # Получаем последние поиски пользователя
+    history = (await db.get_user_search_history(user_id, limit=20))["items"]
     
     if not history:
         await callback.answer("У пользователя нет истории поиска.")
@@ -312,7 +285,7 @@ async def show_user_history(callback: CallbackQuery, db):
         message_text += (
             f"{i}. <b>{item['query']}</b>\n"
             f"📅 Дата: {formatted_date}\n"
-            f"Найдено шрифтов: {len(item['fonts'])}\n\n"
+            f"Найдено шрифтов: {item['font_count']}\n\n"
         )
     
     # Создаем клавиатуру для возврата
@@ -337,18 +310,11 @@ async def show_user_history(callback: CallbackQuery, db):
 
 @router.callback_query(F.data.startswith("admin_make_admin_"))
 async def make_admin(callback: CallbackQuery, db):
-    admin_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if admin_id not in ADMIN_IDS and not db.is_admin(admin_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
     # Получаем ID пользователя
     user_id = int(callback.data.split("_")[3])
     
     # Делаем пользователя администратором
-    db.set_admin(user_id, True)
+    await admin_registry.set_admin(user_id, True)
     
     await callback.answer("Пользователь назначен администратором!")
     
@@ -356,53 +322,87 @@ async def make_admin(callback: CallbackQuery, db):
     await show_user_info(callback, db)
 
 @router.callback_query(F.data == "admin_stats")
-async def show_statistics(callback: CallbackQuery, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к этой функции", show_alert=True)
-        return
-    
-    # Получаем статистику
-    user_count = db.get_user_count()
-    admin_count = db.get_admin_count()
-    search_count = db.get_search_count()
-    font_count = db.get_font_count()
-    doc_count = db.get_document_count()
-    font_stats = db.get_font_stats()
-    total_downloads = font_stats.get("total_downloads", 0) if font_stats else 0
-    
-    # Получаем статистику локальных поисков
-    local_search_stats = db.get_local_search_stats()
-    local_search_count = local_search_stats.get("total_searches", 0) if local_search_stats else 0
-    unique_users = local_search_stats.get("unique_users", 0) if local_search_stats else 0
-    unique_queries = local_search_stats.get("unique_queries", 0) if local_search_stats else 0
-    avg_results = local_search_stats.get("avg_results", 0) if local_search_stats else 0
-    top_queries = local_search_stats.get("top_queries", []) if local_search_stats else []
+async def show_statistics(callback: CallbackQuery, db, fsm_storage):
+    # Получаем статистику одним запросом к счетчикам, поддерживаемым триггерами
+    snapshot = await db.get_dashboard_snapshot()
+    local_search_stats = snapshot["local_searches"]
     
     # Формируем сообщение со статистикой
     stats_message = (
         "📊 <b>Статистика бота</b>\n\n"
-        f"👥 Всего пользователей: {user_count}\n"
-        f"👑 Администраторов: {admin_count}\n"
-        f"🔍 Всего поисков: {search_count}\n"
-        f"🔤 Шрифтов в базе: {font_count}\n"
-        f"📄 Документов: {doc_count}\n"
-        f"⬇️ Всего загрузок: {total_downloads}\n\n"
+        f"👥 Всего пользователей: {snapshot['user_count']}\n"
+        f"👑 Администраторов: {snapshot['admin_count']}\n"
+        f"🔍 Всего поисков: {snapshot['search_count']}\n"
+        f"🔤 Шрифтов в базе: {snapshot['font_count']}\n"
+        f"📄 Документов: {snapshot['document_count']}\n"
+        f"⬇️ Всего загрузок: {snapshot['total_downloads']}\n\n"
         f"<b>Статистика локальных поисков:</b>\n"
-        f"🔍 Всего локальных поисков: {local_search_count}\n"
-        f"👤 Уникальных пользователей: {unique_users}\n"
-        f"❓ Уникальных запросов: {unique_queries}\n"
-        f"📊 Среднее количество результатов: {avg_results:.1f}\n"
+        f"🔍 Всего локальных поисков: {local_search_stats['total_searches']}\n"
+        f"👤 Уникальных пользователей: {local_search_stats['unique_users']}\n"
+        f"❓ Уникальных запросов: {local_search_stats['unique_queries']}\n"
+        f"📊 Среднее количество результатов: {local_search_stats['avg_results']:.1f}\n"
     )
     
     # Добавляем топ запросов, если они есть
-    if top_queries:
+    if local_search_stats["top_queries"]:
         stats_message += "\n<b>Популярные запросы:</b>\n"
-        for i, (query, count) in enumerate(top_queries[:5], 1):
+        for i, (query, count) in enumerate(local_search_stats["top_queries"], 1):
             stats_message += f"{i}. {query} - {count} раз\n"
     
+    # Добавляем счетчики кеша поиска
+    cache_stats = search_cache.stats()
+    stats_message += (
+        "\n<b>Кеш поиска:</b>\n"
+        f"💾 Записей в памяти: {cache_stats['size']}\n"
+        f"✅ Попаданий (память/БД): {cache_stats['memory_hits']}/{cache_stats['db_hits']}\n"
+        f"✂️ Ответов по префиксу: {cache_stats['prefix_hits']}\n"
+        f"❌ Промахов: {cache_stats['misses']}\n"
+        f"♻️ Вытеснений: {cache_stats['evictions']}\n"
+    )
+    
+    # Добавляем счетчики кеша результатов поиска
+    result_stats = result_store.stats()
+    stats_message += (
+        "\n<b>Результаты поиска в памяти:</b>\n"
+        f"💾 Поисков: {result_stats['size']}\n"
+        f"✅ Попаданий: {result_stats['hits']}\n"
+        f"🗄️ Загружено из БД: {result_stats['db_loads']}\n"
+    )
+    
+    # Добавляем счетчики отложенной записи аналитики
+    analytics_stats = analytics.stats()
+    stats_message += (
+        "\n<b>Запись аналитики:</b>\n"
+        f"✍️ Записей пользователей: {analytics_stats['user_writes']}\n"
+        f"⏭️ Пропущено без изменений: {analytics_stats['user_skips']}\n"
+        f"🕒 Ожидают записи: {analytics_stats['pending']}\n"
+        f"✅ Записано событий: {analytics_stats['flushed']}\n"
+        f"❌ Ошибок записи: {analytics_stats['failed_flushes']}\n"
+        f"🗑️ Отброшено при переполнении: {analytics_stats['dropped']}\n"
+    )
+    
+    # Добавляем счетчики хранилища состояний FSM (передается диспетчером)
+    if hasattr(fsm_storage, "stats"):
+        fsm_stats = fsm_storage.stats()
+        stats_message += (
+            "\n<b>Состояния диалогов:</b>\n"
+            f"💾 В памяти: {fsm_stats['cached']}\n"
+            f"🕒 Ожидают записи: {fsm_stats['pending']}\n"
+            f"✅ Записано: {fsm_stats['flushed']}\n"
+            f"🗑️ Удалено устаревших: {fsm_stats['expired']}\n"
+        )
+    
+    # Добавляем состояние очереди скачиваний
+    queue_stats = download_queue.stats()
+    stats_message += (
+        "\n<b>Очередь скачиваний:</b>\n"
+        f"🕒 В очереди: {queue_stats['queued']}\n"
+        f"⏳ Выполняется: {queue_stats['active']}\n"
+        f"✅ Выполнено: {queue_stats['completed']}\n"
+        f"❌ С ошибкой: {queue_stats['failed']}\n"
+        f"🚫 Отклонено: {queue_stats['rejected']}\n"
+    )
+    
     # Создаем клавиатуру для возврата в админ-панель
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="◀️ Назад в админ-панель", callback_data="admin")],
@@ -414,15 +414,8 @@ async def show_statistics(callback: CallbackQuery, db):
 
 @router.callback_query(F.data == "admin_local_fonts")
 async def show_local_fonts(callback: CallbackQuery, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
     # Получаем список локальных шрифтов
-    fonts = db.get_local_fonts()
+    fonts = await db.get_local_fonts()
     
     # Формируем сообщение
     message_text = f"🗃️ <b>Локальная база шрифтов</b>\n\nВсего шрифтов: {len(fonts)}"
@@ -443,18 +436,11 @@ async def show_local_fonts(callback: CallbackQuery, db):
 
 @router.callback_query(F.data.startswith("admin_local_fonts_page_"))
 async def navigate_local_fonts(callback: CallbackQuery, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
     # Получаем номер страницы
     page = int(callback.data.split("_")[-1])
     
     # Получаем список локальных шрифтов
-    fonts = db.get_local_fonts()
+    fonts = await db.get_local_fonts()
     
     # Формируем сообщение
     message_text = f"🗃️ <b>Локальная база шрифтов</b>\n\nВсего шрифтов: {len(fonts)}"
@@ -471,19 +457,16 @@ async def navigate_local_fonts(callback: CallbackQuery, db):
 
 @router.callback_query(F.data.startswith("admin_font_"))
 async def show_font_info(callback: CallbackQuery, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
+    # Префикс admin_font_ совпадает с кнопкой статистики шрифта
+    if callback.data.startswith("admin_font_stats_"):
+        await show_font_stats(callback, db)
         return
     
     # Получаем ID шрифта
     font_id = int(callback.data.split("_")[-1])
     
     # Получаем информацию о шрифте
-    fonts = db.get_local_fonts()
-    font = next((f for f in fonts if f["id"] == font_id), None)
+    font = await db.get_local_font_by_id(font_id)
     
     if not font:
         await callback.answer("Шрифт не найден.")
@@ -548,37 +531,57 @@ async def show_font_info(callback: CallbackQuery, db):
 async def download_font(callback: CallbackQuery, db):
     user_id = callback.from_user.id
     
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
     # Получаем ID шрифта
     font_id = int(callback.data.split("_")[-1])
     
     # Получаем информацию о шрифте
-    fonts = db.get_local_fonts()
-    font = next((f for f in fonts if f["id"] == font_id), None)
+    font = await db.get_local_font_by_id(font_id)
     
     if not font:
         await callback.answer("Шрифт не найден.")
         return
     
     # Увеличиваем счетчик загрузок
-    db.increment_font_download_count(font_id)
+    await analytics.increment_font_download_count(font_id)
     
     # Отправляем сообщение о начале скачивания
     status_message = await callback.message.answer(f"⏳ Начинаю скачивание шрифта {font['font_name']}...")
     
+    # Ставим скачивание в общую очередь с ограниченным числом обработчиков,
+    # позиция в очереди обновляется по мере освобождения обработчиков
+    try:
+        download_queue.submit(
+            user_id,
+            lambda: deliver_local_font(callback.message, status_message, db, font),
+            on_position=status_position(status_message, f"Шрифт {font['font_name']}")
+        )
+    except UserDownloadLimit:
+        await status_message.edit_text("⚠️ У вас уже есть скачивания в процессе. Дождитесь их завершения.")
+    except DownloadQueueFull:
+        await status_message.edit_text("⚠️ Сейчас слишком много скачиваний. Попробуйте позже.")
+    
+    await callback.answer()
+
+async def deliver_local_font(message: Message, status_message: Message, db, font):
+    """Отправка шрифта из локальной базы (выполняется обработчиком очереди скачиваний)"""
+    font_id = font["id"]
+    caption = f"Шрифт: {font['font_name']}"
+    
     try:
-        # Если это документ и файл существует, отправляем его
-        if font["is_document"] and font["file_path"] and os.path.exists(font["file_path"]):
+        # Если шрифт уже отправлялся, повторно отправляем его по file_id без загрузки файла
+        if await send_by_file_id(message, font["telegram_file_id"], caption):
+            logging.info(f"Шрифт {font['font_slug']} отправлен по сохраненному file_id")
+            await status_message.edit_text(f"✅ Шрифт {font['font_name']} успешно отправлен!")
+        # Если файл шрифта уже есть в хранилище, отправляем его без повторного скачивания
+        elif font_store.is_available(font["file_path"]):
             logging.info(f"Отправка локального файла шрифта: {font['file_path']}")
             
             try:
-                await callback.message.answer_document(
-                    FSInputFile(font["file_path"], filename=os.path.basename(font["file_path"])),
-                    caption=f"Шрифт: {font['font_name']}"
+                ext = os.path.splitext(font["file_path"])[1]
+                await font_downloads.deliver(
+                    message, db, font_id, font["font_slug"], font["file_path"],
+                    filename=f"{font['font_name']}{ext}",
+                    caption=caption
                 )
                 await status_message.edit_text(f"✅ Шрифт {font['font_name']} успешно отправлен!")
             except Exception as e:
@@ -589,45 +592,34 @@ async def download_font(callback: CallbackQuery, db):
             download_url = font["download_url"]
             logging.info(f"Скачивание шрифта по ссылке: {download_url}")
             
-            # Генерируем уникальное имя файла
-            filename = f"{uuid.uuid4()}_{font['font_slug']}.zip"
-            file_path = os.path.join(FONTS_DIR, filename)
-            
             try:
-                # Скачиваем файл
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(download_url) as response:
-                        if response.status == 200:
-                            # Сохраняем файл
-                            async with aiofiles.open(file_path, 'wb') as f:
-                                await f.write(await response.read())
-                            
-                            # Обновляем путь к файлу в базе данных
-                            db.cursor.execute(
-                                "UPDATE local_fonts SET file_path = ? WHERE id = ?",
-                                (file_path, font_id)
-                            )
-                            db.connection.commit()
-                            
-                            # Отправляем файл пользователю
-                            await callback.message.answer_document(
-                                FSInputFile(file_path, filename=f"{font['font_name']}.zip"),
-                                caption=f"Шрифт: {font['font_name']}"
-                            )
-                            
-                            await status_message.edit_text(f"✅ Шрифт {font['font_name']} успешно скачан и отправлен!")
-                            logging.info(f"Шрифт успешно скачан и сохранен: {file_path}")
-                        else:
-                            # Если не удалось скачать, отправляем ссылку
-                            await callback.message.answer(
-                                f"⬇️ Ссылка для скачивания шрифта {font['font_name']}:\n{download_url}",
-                                disable_web_page_preview=True
-                            )
-                            await status_message.edit_text(f"⚠️ Не удалось скачать шрифт. Отправлена ссылка для ручного скачивания.")
-                            logging.warning(f"Не удалось скачать шрифт. Статус: {response.status}")
+                # Скачиваем файл частями с отображением прогресса
+                # (одновременные запросы одного шрифта ждут одно скачивание)
+                _, file_path = await font_downloads.fetch(
+                    db, font["font_slug"], download_url,
+                    on_progress=status_progress(status_message, f"⏳ Скачивание шрифта {font['font_name']}")
+                )
+                
+                # Отправляем файл пользователю и запоминаем его file_id
+                await font_downloads.deliver(
+                    message, db, font_id, font["font_slug"], file_path,
+                    filename=f"{font['font_name']}.zip",
+                    caption=caption
+                )
+                
+                await status_message.edit_text(f"✅ Шрифт {font['font_name']} успешно скачан и отправлен!")
+                logging.info(f"Шрифт успешно скачан и сохранен: {file_path}")
+            except DownloadError as e:
+                # Если не удалось скачать, отправляем ссылку
+                await message.answer(
+                    f"⬇️ Ссылка для скачивания шрифта {font['font_name']}:\n{download_url}",
+                    disable_web_page_preview=True
+                )
+                await status_message.edit_text(f"⚠️ Не удалось скачать шрифт ({str(e)}). Отправлена ссылка для ручного скачивания.")
+                logging.warning(f"Не удалось скачать шрифт: {e}")
             except Exception as e:
                 # В случае ошибки отправляем ссылку
-                await callback.message.answer(
+                await message.answer(
                     f"⬇️ Ссылка для скачивания шрифта {font['font_name']}:\n{download_url}",
                     disable_web_page_preview=True
                 )
@@ -636,31 +628,21 @@ async def download_font(callback: CallbackQuery, db):
     except Exception as e:
         logging.error(f"Общая ошибка при скачивании шрифта: {e}")
         await status_message.edit_text(f"❌ Произошла ошибка: {str(e)}")
-    
-    await callback.answer()
 
 @router.callback_query(F.data.startswith("admin_delete_font_"))
 async def delete_font(callback: CallbackQuery, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
     # Получаем ID шрифта
     font_id = int(callback.data.split("_")[-1])
     
     # Получаем информацию о шрифте
-    fonts = db.get_local_fonts()
-    font = next((f for f in fonts if f["id"] == font_id), None)
+    font = await db.get_local_font_by_id(font_id)
     
     if not font:
         await callback.answer("Шрифт не найден.")
         return
     
     # Удаляем шрифт из базы
-    success = db.delete_local_font(font_id)
+    success = await db.delete_local_font(font_id)
     
     if success:
         await callback.answer("Шрифт успешно удален из базы.")
@@ -671,16 +653,6 @@ async def delete_font(callback: CallbackQuery, db):
 
 @router.callback_query(F.data == "admin_search_local_fonts")
 async def search_local_fonts_prompt(callback: CallbackQuery, state: FSMContext):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
-    # Получаем объект базы данных из атрибута роутера
-    db = router.db
-    
     # Устанавливаем состояние ожидания поискового запроса
     await state.set_state(AdminAction.waiting_for_font_search)
     
@@ -697,11 +669,6 @@ async def search_local_fonts_prompt(callback: CallbackQuery, state: FSMContext):
 async def search_local_fonts(message: Message, state: FSMContext, db):
     user_id = message.from_user.id
     
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await message.answer("У вас нет доступа к админ-панели.")
-        return
-    
     # Получаем поисковый запрос
     query = message.text.strip()
     
@@ -713,7 +680,11 @@ async def search_local_fonts(message: Message, state: FSMContext, db):
     
     try:
         # Выполняем поиск в локальной базе
-        fonts = db.search_local_fonts(query)
+        fonts = await db.search_local_fonts(query)
+        if not fonts:
+            # Точных совпадений нет - пробуем найти названия с опечатками
+            fonts = await fuzzy_search_fonts(db, query)
+        await analytics.log_local_search(user_id, query, len(fonts))
         
         # Формируем сообщение
         if fonts:
@@ -755,13 +726,6 @@ async def search_local_fonts(message: Message, state: FSMContext, db):
 
 @router.callback_query(F.data.startswith("admin_refresh_font_"))
 async def refresh_font_info(callback: CallbackQuery, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
     # Получаем ID шрифта
     font_id = int(callback.data.split("_")[-1])
     
@@ -773,19 +737,11 @@ async def refresh_font_info(callback: CallbackQuery, db):
 
 @router.callback_query(F.data.startswith("admin_font_stats_"))
 async def show_font_stats(callback: CallbackQuery, db):
-    user_id = callback.from_user.id
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id not in ADMIN_IDS and not db.is_admin(user_id):
-        await callback.answer("У вас нет доступа к админ-панели.")
-        return
-    
     # Получаем ID шрифта
     font_id = int(callback.data.split("_")[-1])
     
     # Получаем информацию о шрифте
-    fonts = db.get_local_fonts()
-    font = next((f for f in fonts if f["id"] == font_id), None)
+    font = await db.get_local_font_by_id(font_id)
     
     if not font:
         await callback.answer("Шрифт не найден.")
@@ -4,18 +4,13 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from keyboards.main_menu import get_main_menu_keyboard
+from services.font_store import font_store
+from database.analytics import analytics
 import os
 import logging
-import uuid
 
 router = Router()
 
-# Папка для сохранения документов
-FONTS_DIR = "fonts"
-
-# Создаем папку, если она не существует
-os.makedirs(FONTS_DIR, exist_ok=True)
-
 # Настраиваем логирование
 logging.basicConfig(
     level=logging.INFO,
@@ -61,7 +56,7 @@ async def process_font_document(message: Message, db):
     
     try:
         # Сохраняем информацию о пользователе
-        db.add_user(
+        await analytics.add_user(
             user_id=user_id,
             username=message.from_user.username or "",
             full_name=message.from_user.full_name or ""
@@ -76,6 +71,8 @@ async def process_font_document(message: Message, db):
             )
             return
         
+        # Переносим файл в хранилище: одинаковые файлы хранятся один раз
+        content_hash, file_path = await font_store.add_file(file_path)
         logging.info(f"Файл шрифта сохранен: {file_path}")
         
         # Создаем данные о шрифте
@@ -92,7 +89,7 @@ async def process_font_document(message: Message, db):
         }
         
         # Добавляем шрифт в локальную базу
-        db.add_font_document(user_id, font_data, file_path)
+        await db.add_font_document(user_id, font_data, file_path, content_hash)
         logging.info(f"Шрифт {font_name} добавлен в базу данных")
         
         # Отправляем сообщение пользователю
@@ -115,9 +112,8 @@ def is_font_file(filename):
 async def download_font_file(document):
     """Скачивает файл шрифта и возвращает путь к сохраненному файлу"""
     try:
-        # Генерируем уникальное имя файла
-        unique_filename = f"{uuid.uuid4()}_{document.file_name}"
-        file_path = os.path.join(FONTS_DIR, unique_filename)
+        # Генерируем уникальное имя временного файла
+        file_path = font_store.temp_path(document.file_name)
         
         logging.info(f"Начинаю скачивание файла в {file_path}")
         
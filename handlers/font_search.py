@@ -1,28 +1,27 @@
 import logging
 import os
-import uuid
-import aiohttp
-import aiofiles
 
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, FSInputFile
+from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from keyboards.font_search import get_search_results_keyboard, get_font_info_keyboard
 from services.font_api_client import FontApiClient
-from utils.pagination import paginate_results
+from services.font_store import font_store
+from services.font_delivery import send_by_file_id
+from services.font_downloads import font_downloads
+from services.download_queue import download_queue, status_position, DownloadQueueFull, UserDownloadLimit
+from services.downloader import status_progress, DownloadError, DownloadTooLarge
+from services.result_store import result_store
+from database.analytics import analytics
+from services.font_result import FontResult
+from services.fuzzy_index import fuzzy_search_fonts
 from keyboards.main_menu import get_main_menu_keyboard
 
 router = Router()
 font_api_client = FontApiClient()
 
-# Папка для сохранения шрифтов
-FONTS_DIR = "fonts"
-
-# Создаем папку, если она не существует
-os.makedirs(FONTS_DIR, exist_ok=True)
-
 class FontSearch(StatesGroup):
     waiting_for_query = State()
 
@@ -72,8 +71,15 @@ async def process_font_search(message: Message, state: FSMContext, db):
     # Получаем результаты поиска
     search_results = await font_api_client.search_fonts(query)
 
-    # Добавляем запрос в историю поиска
-    search_id = db.add_search_query(user_id, query)
+    # Ничего не найдено - ищем похожие названия в локальной базе (опечатки)
+    is_fuzzy = False
+    if not search_results:
+        similar_fonts = await fuzzy_search_fonts(db, query)
+        search_results = [FontResult.from_font(font) for font in similar_fonts]
+        is_fuzzy = bool(search_results)
+
+    # Сохраняем запрос и найденные шрифты одной транзакцией
+    search_id = await db.save_search_results(user_id, query, search_results or [], is_fuzzy)
 
     if not search_results:
         await message.answer(
@@ -84,44 +90,47 @@ async def process_font_search(message: Message, state: FSMContext, db):
         await state.clear()
         return
 
-    # Сохраняем найденные шрифты в базе данных
-    for font in search_results:
-        db.add_found_font(search_id, font)
-
-    # Сохраняем результаты поиска и текущую страницу
-    await state.update_data(
-        search_results=search_results,
-        current_page=1,
-        query=query,
-        search_id=search_id
-    )
+    # Результаты хранятся в общем кеше по ID поиска, в состоянии - только ссылка на них
+    result_set = result_store.put(search_id, query, search_results, is_fuzzy)
+    await state.update_data(search_id=search_id, current_page=1)
 
     # Отображаем первую страницу результатов
-    paginated_results = paginate_results(search_results, 1)
-
     await message.answer(
-        f"🔍 Результаты поиска по запросу: {query}\n"
-        f"Найдено шрифтов: {len(search_results)}",
-        reply_markup=get_search_results_keyboard(paginated_results, 1, len(search_results))
+        results_header(result_set),
+        reply_markup=get_search_results_keyboard(result_set.page(1), 1, len(result_set))
     )
 
 
+def results_header(result_set):
+    """Заголовок списка результатов поиска"""
+    if result_set.is_fuzzy:
+        header = f"🤔 Точных совпадений по запросу «{result_set.query}» нет. Возможно, вы искали:\n"
+    else:
+        header = f"🔍 Результаты поиска по запросу: {result_set.query}\n"
+    return f"{header}Найдено шрифтов: {len(result_set)}"
+
+
 @router.callback_query(F.data.startswith("page_"))
-async def process_page_navigation(callback: CallbackQuery, state: FSMContext):
-    page = int(callback.data.split("_")[1])
+async def process_page_navigation(callback: CallbackQuery, state: FSMContext, db):
+    page = callback.data.split("_")[1]
+    if not page.isdigit():
+        # Кнопка с номером страницы
+        await callback.answer()
+        return
+    page = int(page)
 
-    # Получаем сохраненные данные
+    # Получаем результаты поиска по сохраненному ID
     data = await state.get_data()
-    search_results = data.get("search_results", [])
-    query = data.get("query", "")
+    result_set = await result_store.get(db, data.get("search_id"))
 
-    # Отображаем выбранную страницу результатов
-    paginated_results = paginate_results(search_results, page)
+    if result_set is None:
+        await callback.answer("Результаты поиска не найдены. Выполните поиск заново.")
+        return
 
+    # Отображаем выбранную страницу результатов
     await callback.message.edit_text(
-        f"🔍 Результаты поиска по запросу: {query}\n"
-        f"Найдено шрифтов: {len(search_results)}",
-        reply_markup=get_search_results_keyboard(paginated_results, page, len(search_results))
+        results_header(result_set),
+        reply_markup=get_search_results_keyboard(result_set.page(page), page, len(result_set))
     )
 
     # Обновляем текущую страницу
@@ -130,37 +139,25 @@ async def process_page_navigation(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("font_"))
-async def show_font_info(callback: CallbackQuery, state: FSMContext):
+async def show_font_info(callback: CallbackQuery, state: FSMContext, db):
     font_slug = callback.data.split("_")[1]
 
-    # Получаем сохраненные данные
+    # Находим информацию о выбранном шрифте по slug
     data = await state.get_data()
-    search_results = data.get("search_results", [])
-
-    # Находим информацию о выбранном шрифте
-    font_info = None
-    for font in search_results:
-        if font["data"]["slug"] == font_slug:
-            font_info = font
-            break
+    result_set = await result_store.get(db, data.get("search_id"))
+    font_info = result_set.get_font(font_slug) if result_set else None
 
     if not font_info:
         await callback.answer("Информация о шрифте не найдена.")
         return
 
     # Формируем сообщение с информацией о шрифте
-    font_data = font_info["data"]
-    font_name = font_data["font_name"]
-    designer = font_data.get("designer", "Не указан")
-    manufacturer = font_data.get("manufacturer", "Не указан")
-    user_fullname = font_data.get("user_fullname", "")
-
     message_text = (
-        f"🔤 <b>{font_name}</b>\n\n"
-        f"👤 Дизайнер: {designer}\n"
-        f"🏢 Производитель: {manufacturer}\n"
-        f"ℹ️ {user_fullname}\n\n"
-        f"🔗 <a href='{font_data['url']}'>Страница шрифта</a>"
+        f"🔤 <b>{font_info.font_name or font_info.name}</b>\n\n"
+        f"👤 Дизайнер: {font_info.designer or 'Не указан'}\n"
+        f"🏢 Производитель: {font_info.manufacturer or 'Не указан'}\n"
+        f"ℹ️ {font_info.user_fullname}\n\n"
+        f"🔗 <a href='{font_info.url}'>Страница шрифта</a>"
     )
 
     await callback.message.edit_text(
@@ -179,71 +176,83 @@ async def download_font(callback: CallbackQuery, db):
     # Отправляем сообщение о начале скачивания
     status_message = await callback.message.answer(f"⏳ Начинаю скачивание шрифта {font_slug}...")
     
+    # Ставим скачивание в общую очередь с ограниченным числом обработчиков,
+    # позиция в очереди обновляется по мере освобождения обработчиков
     try:
-        logging.info(f"Скачивание шрифта по ссылке: {download_url}")
+        download_queue.submit(
+            callback.from_user.id,
+            lambda: deliver_font(callback.message, status_message, db, font_slug, download_url),
+            on_position=status_position(status_message, f"Шрифт {font_slug}")
+        )
+    except UserDownloadLimit:
+        await status_message.edit_text(
+            "⚠️ У вас уже есть скачивания в процессе. Дождитесь их завершения и попробуйте снова."
+        )
+    except DownloadQueueFull:
+        logging.warning(f"Очередь скачиваний переполнена, запрос шрифта {font_slug} отклонен")
+        await send_download_link(callback.message, font_slug, download_url)
+        await status_message.edit_text("⚠️ Сейчас слишком много скачиваний. Отправлена ссылка для ручного скачивания.")
+    
+    await callback.answer()
+
+
+async def send_download_link(message: Message, font_slug: str, download_url: str):
+    """Отправка ссылки для ручного скачивания шрифта"""
+    await message.answer(
+        f"⬇️ Скачать шрифт: <a href='{download_url}'>{font_slug}</a>",
+        parse_mode="HTML"
+    )
+
+
+async def deliver_font(message: Message, status_message: Message, db, font_slug: str, download_url: str):
+    """Скачивание и отправка шрифта (выполняется обработчиком очереди скачиваний)"""
+    try:
+        font = await db.get_local_font_by_slug(font_slug)
+        caption = f"Шрифт: {font_slug}"
+        
+        # Если шрифт уже отправлялся, повторно отправляем его по file_id без загрузки файла
+        if font and await send_by_file_id(message, font["telegram_file_id"], caption):
+            font_id = font["id"]
+            logging.info(f"Шрифт {font_slug} отправлен по сохраненному file_id")
+        else:
+            # Если файл шрифта уже есть в хранилище, отправляем его без обращения к сайту
+            if font and font_store.is_available(font["file_path"]):
+                file_path = font["file_path"]
+                font_id = font["id"]
+                logging.info(f"Шрифт {font_slug} найден в хранилище: {file_path}")
+            else:
+                logging.info(f"Скачивание шрифта по ссылке: {download_url}")
+                
+                if font_downloads.is_downloading(font_slug):
+                    await status_message.edit_text(f"⏳ Шрифт {font_slug} уже скачивается, ожидаю завершения...")
+                
+                # Скачиваем файл частями с отображением прогресса
+                # (одновременные запросы одного шрифта ждут одно скачивание)
+                font_id, file_path = await font_downloads.fetch(
+                    db, font_slug, download_url,
+                    on_progress=status_progress(status_message, f"⏳ Скачивание шрифта {font_slug}")
+                )
+            
+            # Отправляем файл пользователю и запоминаем его file_id
+            await font_downloads.deliver(
+                message, db, font_id, font_slug, file_path,
+                filename=f"{font_slug}{os.path.splitext(file_path)[1] or '.zip'}",
+                caption=caption
+            )
         
-        # Генерируем уникальное имя файла
-        filename = f"{uuid.uuid4()}_{font_slug}.zip"
-        file_path = os.path.join(FONTS_DIR, filename)
+        # Увеличиваем счетчик загрузок
+        await analytics.increment_font_download_count(font_id)
         
-        # Скачиваем файл
-        async with aiohttp.ClientSession() as session:
-            async with session.get(download_url) as response:
-                if response.status == 200:
-                    # Сохраняем файл
-                    async with aiofiles.open(file_path, 'wb') as f:
-                        await f.write(await response.read())
-                    
-                    # Проверяем, что файл действительно скачался
-                    if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                        logging.info(f"Шрифт успешно скачан и сохранен: {file_path}")
-                        
-                        # Ищем шрифт в локальной базе
-                        db.cursor.execute(
-                            "SELECT id FROM local_fonts WHERE font_slug = ?",
-                            (font_slug,)
-                        )
-                        result = db.cursor.fetchone()
-                        
-                        if result:
-                            # Если шрифт уже есть в базе, обновляем путь к файлу
-                            font_id = result[0]
-                            db.cursor.execute(
-                                "UPDATE local_fonts SET file_path = ? WHERE id = ?",
-                                (file_path, font_id)
-                            )
-                            db.connection.commit()
-                            
-                            # Увеличиваем счетчик загрузок
-                            db.increment_font_download_count(font_id)
-                        
-                        # Отправляем файл пользователю
-                        await callback.message.answer_document(
-                            FSInputFile(file_path, filename=f"{font_slug}.zip"),
-                            caption=f"Шрифт: {font_slug}"
-                        )
-                        
-                        await status_message.edit_text(f"✅ Шрифт {font_slug} успешно скачан и отправлен!")
-                    else:
-                        logging.error(f"Файл не был скачан или имеет нулевой размер: {file_path}")
-                        await callback.message.answer(
-                            f"⬇️ Скачать шрифт: <a href='{download_url}'>{font_slug}</a>",
-                            parse_mode="HTML"
-                        )
-                        await status_message.edit_text(f"⚠️ Не удалось скачать шрифт. Отправлена ссылка для ручного скачивания.")
-                else:
-                    logging.warning(f"Не удалось скачать шрифт. Статус: {response.status}")
-                    await callback.message.answer(
-                        f"⬇️ Скачать шрифт: <a href='{download_url}'>{font_slug}</a>",
-                        parse_mode="HTML"
-                    )
-                    await status_message.edit_text(f"⚠️ Не удалось скачать шрифт. Отправлена ссылка для ручного скачивания.")
+        await status_message.edit_text(f"✅ Шрифт {font_slug} успешно скачан и отправлен!")
+    except DownloadTooLarge as e:
+        logging.warning(f"Шрифт {font_slug} слишком большой для отправки: {e}")
+        await send_download_link(message, font_slug, download_url)
+        await status_message.edit_text(f"⚠️ Архив шрифта слишком большой для отправки. Отправлена ссылка для ручного скачивания.")
+    except DownloadError as e:
+        logging.warning(f"Не удалось скачать шрифт: {e}")
+        await send_download_link(message, font_slug, download_url)
+        await status_message.edit_text(f"⚠️ Не удалось скачать шрифт. Отправлена ссылка для ручного скачивания.")
     except Exception as e:
         logging.error(f"Ошибка при скачивании шрифта: {e}")
-        await callback.message.answer(
-            f"⬇️ Скачать шрифт: <a href='{download_url}'>{font_slug}</a>",
-            parse_mode="HTML"
-        )
+        await send_download_link(message, font_slug, download_url)
         await status_message.edit_text(f"❌ Ошибка при скачивании: {str(e)}")
-    
-    await callback.answer()
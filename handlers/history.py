@@ -27,46 +27,67 @@ class DbMiddleware:
         data["db"] = self.db
         return await handler(event, data)
 
+EMPTY_HISTORY_TEXT = (
+    "📂 У вас пока нет истории поиска.\n"
+    "Воспользуйтесь поиском шрифтов, чтобы начать создавать историю."
+)
+
+HISTORY_TEXT = (
+    "📂 История поиска\n\n"
+    "Выберите запрос для просмотра подробной информации:"
+)
+
 @router.message(Command("history"))
 async def cmd_history(message: Message, db):
     user_id = message.from_user.id
     
-    # Получаем историю поиска пользователя
-    history = db.get_user_search_history(user_id)
+    # Получаем первую страницу истории поиска пользователя
+    page = await db.get_user_search_history(user_id)
     
-    if not history:
-        await message.answer(
-            "📂 У вас пока нет истории поиска.\n"
-            "Воспользуйтесь поиском шрифтов, чтобы начать создавать историю.",
-            reply_markup=get_main_menu_keyboard()
-        )
+    if not page["items"]:
+        await message.answer(EMPTY_HISTORY_TEXT, reply_markup=get_main_menu_keyboard())
         return
     
     await message.answer(
-        "📂 История поиска\n\n"
-        "Выберите запрос для просмотра подробной информации:",
-        reply_markup=get_history_keyboard(history)
+        HISTORY_TEXT,
+        reply_markup=get_history_keyboard(page["items"], page["has_older"], page["has_newer"])
     )
 
 @router.callback_query(F.data == "history")
 async def show_history(callback: CallbackQuery, db):
     user_id = callback.from_user.id
     
-    # Получаем историю поиска пользователя
-    history = db.get_user_search_history(user_id)
+    # Получаем первую страницу истории поиска пользователя
+    page = await db.get_user_search_history(user_id)
     
-    if not history:
-        await callback.message.edit_text(
-            "📂 У вас пока нет истории поиска.\n"
-            "Воспользуйтесь поиском шрифтов, чтобы начать создавать историю.",
-            reply_markup=get_main_menu_keyboard()
-        )
+    if not page["items"]:
+        await callback.message.edit_text(EMPTY_HISTORY_TEXT, reply_markup=get_main_menu_keyboard())
+        return
+    
+    await callback.message.edit_text(
+        HISTORY_TEXT,
+        reply_markup=get_history_keyboard(page["items"], page["has_older"], page["has_newer"])
+    )
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("history_older_") | F.data.startswith("history_newer_"))
+async def navigate_history(callback: CallbackQuery, db):
+    user_id = callback.from_user.id
+    _, direction, search_id = callback.data.split("_")
+    
+    # Получаем соседнюю страницу относительно первого или последнего поиска текущей
+    if direction == "older":
+        page = await db.get_user_search_history(user_id, older_than=int(search_id))
+    else:
+        page = await db.get_user_search_history(user_id, newer_than=int(search_id))
+    
+    if not page["items"]:
+        await callback.answer("Больше записей нет.")
         return
     
     await callback.message.edit_text(
-        "📂 История поиска\n\n"
-        "Выберите запрос для просмотра подробной информации:",
-        reply_markup=get_history_keyboard(history)
+        HISTORY_TEXT,
+        reply_markup=get_history_keyboard(page["items"], page["has_older"], page["has_newer"])
     )
     await callback.answer()
 
@@ -75,7 +96,7 @@ async def show_history_item(callback: CallbackQuery, db):
     search_id = int(callback.data.split("_")[2])
     
     # Получаем подробную информацию о поиске
-    search_details = db.get_search_details(search_id)
+    search_details = await db.get_search_details(search_id)
     
     if not search_details:
         await callback.answer("Информация о поиске не найдена.")
@@ -3,6 +3,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from keyboards.main_menu import get_main_menu_keyboard
+from database.analytics import analytics
 
 router = Router()
 
@@ -24,8 +25,8 @@ class UserMiddleware:
         else:
             return await handler(event, data)
         
-        # Добавляем пользователя в базу данных
-        self.db.add_user(
+        # Добавляем пользователя в базу данных (отложенная запись, только для новых или изменившихся данных)
+        await analytics.add_user(
             user_id=user.id,
             username=user.username or "",
             full_name=f"{user.first_name} {user.last_name or ''}".strip()
@@ -25,19 +25,15 @@ def get_admin_keyboard():
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def get_users_keyboard(users, page=1, items_per_page=5):
+def get_users_keyboard(users, page=1, total_pages=1, has_older=False, has_newer=False):
     """
-    Создает клавиатуру со списком пользователей
+    Создает клавиатуру с одной страницей списка пользователей.
+    Кнопки навигации передают номер страницы и ID крайнего пользователя для пагинации по ключу.
     """
     keyboard = []
     
-    # Пагинация
-    total_pages = (len(users) + items_per_page - 1) // items_per_page
-    start_idx = (page - 1) * items_per_page
-    end_idx = min(start_idx + items_per_page, len(users))
-    
     # Добавляем кнопки для каждого пользователя на текущей странице
-    for user in users[start_idx:end_idx]:
+    for user in users:
         # Форматируем дату регистрации
         reg_date = datetime.datetime.fromisoformat(user["registration_date"])
         formatted_date = reg_date.strftime("%d.%m.%Y")
@@ -53,18 +49,23 @@ def get_users_keyboard(users, page=1, items_per_page=5):
     # Добавляем кнопки навигации
     navigation = []
     
-    if page > 1:
+    if has_newer and users:
         navigation.append(
-            InlineKeyboardButton(text="⬅️ Назад", callback_data=f"admin_users_page_{page - 1}")
+            InlineKeyboardButton(
+                text="⬅️ Назад", callback_data=f"admin_users_page_{page - 1}_newer_{users[0]['user_id']}"
+            )
         )
     
+    # Пока список листают, записи добавляются, поэтому номер страницы может опережать их количество
     navigation.append(
-        InlineKeyboardButton(text=f"{page}/{total_pages}", callback_data="admin_users_page_info")
+        InlineKeyboardButton(text=f"{page}/{max(page, total_pages)}", callback_data="admin_users_page_info")
     )
     
-    if page < total_pages:
+    if has_older and users:
         navigation.append(
-            InlineKeyboardButton(text="Вперед ➡️", callback_data=f"admin_users_page_{page + 1}")
+            InlineKeyboardButton(
+                text="Вперед ➡️", callback_data=f"admin_users_page_{page + 1}_older_{users[-1]['user_id']}"
+            )
         )
     
     if navigation:
@@ -81,19 +82,15 @@ def get_users_keyboard(users, page=1, items_per_page=5):
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def get_searches_keyboard(searches, page=1, items_per_page=5):
+def get_searches_keyboard(searches, page=1, total_pages=1, has_older=False, has_newer=False):
     """
-    Создает клавиатуру со списком поисковых запросов
+    Создает клавиатуру с одной страницей списка поисковых запросов.
+    Кнопки навигации передают номер страницы и ID крайнего поиска для пагинации по ключу.
     """
     keyboard = []
     
-    # Пагинация
-    total_pages = (len(searches) + items_per_page - 1) // items_per_page
-    start_idx = (page - 1) * items_per_page
-    end_idx = min(start_idx + items_per_page, len(searches))
-    
     # Добавляем кнопки для каждого поиска на текущей странице
-    for search in searches[start_idx:end_idx]:
+    for search in searches:
         # Форматируем дату поиска
         search_date = datetime.datetime.fromisoformat(search["search_date"])
         formatted_date = search_date.strftime("%d.%m.%Y %H:%M")
@@ -108,18 +105,23 @@ def get_searches_keyboard(searches, page=1, items_per_page=5):
     # Добавляем кнопки навигации
     navigation = []
     
-    if page > 1:
+    if has_newer and searches:
         navigation.append(
-            InlineKeyboardButton(text="⬅️ Назад", callback_data=f"admin_searches_page_{page - 1}")
+            InlineKeyboardButton(
+                text="⬅️ Назад", callback_data=f"admin_searches_page_{page - 1}_newer_{searches[0]['id']}"
+            )
         )
     
+    # Пока список листают, записи добавляются, поэтому номер страницы может опережать их количество
     navigation.append(
-        InlineKeyboardButton(text=f"{page}/{total_pages}", callback_data="admin_searches_page_info")
+        InlineKeyboardButton(text=f"{page}/{max(page, total_pages)}", callback_data="admin_searches_page_info")
     )
     
-    if page < total_pages:
+    if has_older and searches:
         navigation.append(
-            InlineKeyboardButton(text="Вперед ➡️", callback_data=f"admin_searches_page_{page + 1}")
+            InlineKeyboardButton(
+                text="Вперед ➡️", callback_data=f"admin_searches_page_{page + 1}_older_{searches[-1]['id']}"
+            )
         )
     
     if navigation:
@@ -6,12 +6,8 @@ def get_search_results_keyboard(fonts, current_page, total_fonts):
     keyboard = []
     
     for font in fonts:
-        font_data = font["data"]
-        font_name = font["value"]
-        font_slug = font_data["slug"]
-        
         keyboard.append([
-            InlineKeyboardButton(text=f"🔤 {font_name}", callback_data=f"font_{font_slug}")
+            InlineKeyboardButton(text=f"🔤 {font.name}", callback_data=f"font_{font.slug}")
         ])
     
     navigation = []
@@ -1,9 +1,9 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 import datetime
 
-def get_history_keyboard(history_items):
+def get_history_keyboard(history_items, has_older=False, has_newer=False):
     """
-    Создает клавиатуру со списком истории поиска
+    Создает клавиатуру со страницей истории поиска и навигацией по страницам
     """
     keyboard = []
     
@@ -17,6 +17,19 @@ def get_history_keyboard(history_items):
             InlineKeyboardButton(text=button_text, callback_data=f"history_item_{item['id']}")
         ])
     
+    # Навигация по ключу: ID первого и последнего поиска на странице
+    navigation = []
+    if has_newer and history_items:
+        navigation.append(
+            InlineKeyboardButton(text="⬅️ Новее", callback_data=f"history_newer_{history_items[0]['id']}")
+        )
+    if has_older and history_items:
+        navigation.append(
+            InlineKeyboardButton(text="Старее ➡️", callback_data=f"history_older_{history_items[-1]['id']}")
+        )
+    if navigation:
+        keyboard.append(navigation)
+    
     keyboard.append([
         InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")
     ])
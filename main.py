@@ -5,6 +5,14 @@ from aiogram import Bot, Dispatcher
 from config import BOT_TOKEN, DATABASE_PATH, LOGS_DIR, FONTS_DIR, LOG_FILE
 from handlers import register_all_handlers
 from database.db import Database
+from database.async_db import AsyncDatabase
+from database.analytics import analytics
+from database.fsm_storage import SQLiteStorage
+from services.http_session import http_session
+from services.search_cache import search_cache
+from services.admin_registry import admin_registry
+from services.download_queue import download_queue
+from services.fuzzy_index import load_font_index
 
 # Создаем директорию для базы данных, если она не существует
 os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
@@ -15,8 +23,49 @@ os.makedirs(LOGS_DIR, exist_ok=True)
 # Создаем директорию для шрифтов, если она не существует
 os.makedirs(FONTS_DIR, exist_ok=True)
 
-# Инициализация базы данных
-db = Database(DATABASE_PATH)
+# Инициализация базы данных: запросы выполняются вне цикла событий
+database = Database(DATABASE_PATH)
+db = AsyncDatabase(database)
+
+# Подключаем постоянный уровень кеша поиска
+search_cache.bind(db)
+
+# Подключаем отложенную запись аналитики
+analytics.bind(db)
+
+# Подключаем реестр администраторов
+admin_registry.bind(db)
+
+# Состояния диалогов хранятся в базе данных и переживают перезапуск
+fsm_storage = SQLiteStorage(db)
+
+async def on_startup():
+    # Удаляем устаревшие записи кеша поиска
+    await search_cache.purge()
+    # Загружаем администраторов в память
+    await admin_registry.load()
+    # Строим индекс нечеткого поиска по локальной базе шрифтов
+    await load_font_index(db)
+    # Открываем общий пул HTTP-соединений
+    await http_session.start()
+    # Запускаем обработчики очереди скачиваний
+    await download_queue.start()
+    # Запускаем фоновую запись аналитики
+    await analytics.start()
+    # Запускаем запись и очистку состояний FSM
+    await fsm_storage.start()
+
+async def on_shutdown():
+    # Останавливаем очередь скачиваний до закрытия HTTP-сессии
+    await download_queue.stop()
+    # Закрываем пул HTTP-соединений
+    await http_session.close()
+    # Записываем накопленную аналитику до закрытия базы данных
+    await analytics.stop()
+    # Записываем несохраненные состояния FSM
+    await fsm_storage.close()
+    # Закрываем соединение с базой данных
+    await db.close()
 
 async def main():
     # Настройка логирования
@@ -33,7 +82,9 @@ async def main():
     
     # Инициализация бота и диспетчера
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher()
+    dp = Dispatcher(storage=fsm_storage)
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
     
     # Регистрация всех обработчиков
     register_all_handlers(dp, db)
@@ -51,4 +102,4 @@ if __name__ == "__main__":
     finally:
         # Закрываем соединение с базой данных при завершении работы
         logging.info("Завершение работы бота")
-        db.close() 
\ No newline at end of file
+        database.close() 
\ No newline at end of file
@@ -0,0 +1,48 @@
+import logging
+from typing import Set
+
+from config import ADMIN_IDS
+
+
+class AdminRegistry:
+    """
+    Множество администраторов в памяти: загружается из базы при запуске
+    и обновляется при назначении, поэтому проверка прав не обращается к базе.
+    Администраторы из ADMIN_IDS имеют доступ всегда.
+    """
+
+    def __init__(self):
+        self._db = None
+        # Пользователи с флагом is_admin в базе данных
+        self._admins: Set[int] = set()
+
+    def bind(self, db) -> None:
+        """Подключение асинхронной базы данных"""
+        self._db = db
+
+    async def load(self) -> None:
+        """Загрузка администраторов из базы (вызывается при запуске диспетчера)"""
+        if self._db is None:
+            return
+        self._admins = set(await self._db.get_admin_ids())
+        logging.info(f"Загружено администраторов: {len(self._admins)} в базе, {len(ADMIN_IDS)} в настройках")
+
+    def is_admin(self, user_id: int) -> bool:
+        """Проверка прав администратора"""
+        return user_id in ADMIN_IDS or user_id in self._admins
+
+    async def set_admin(self, user_id: int, is_admin: bool = True) -> None:
+        """Назначение или снятие прав администратора в базе и в памяти"""
+        await self._db.set_admin(user_id, is_admin)
+        if is_admin:
+            self._admins.add(user_id)
+        else:
+            self._admins.discard(user_id)
+
+    async def ensure_persisted(self, user_id: int) -> None:
+        """Отметка администратора из ADMIN_IDS в базе (запись только при первом входе)"""
+        if user_id in ADMIN_IDS and user_id not in self._admins:
+            await self.set_admin(user_id, True)
+
+
+admin_registry = AdminRegistry()
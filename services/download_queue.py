@@ -0,0 +1,192 @@
+import asyncio
+import logging
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from config import DOWNLOAD_WORKERS, DOWNLOAD_QUEUE_SIZE, DOWNLOAD_USER_LIMIT, DOWNLOAD_PROGRESS_INTERVAL
+
+DownloadJob = Callable[[], Awaitable[None]]
+# Колбэк с количеством заданий перед ожидающим заданием
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class DownloadQueueFull(Exception):
+    """Очередь скачиваний переполнена"""
+
+
+class UserDownloadLimit(Exception):
+    """Пользователь превысил лимит одновременных скачиваний"""
+
+
+def status_position(status_message, title: str) -> PositionCallback:
+    """Колбэк позиции в очереди, обновляющий сообщение о статусе скачивания"""
+    async def report(position: int) -> None:
+        await status_message.edit_text(f"🕒 {title} поставлен в очередь на скачивание. Перед вами: {position}")
+
+    return report
+
+
+class _Entry:
+    """Задание в очереди и последняя сообщенная пользователю позиция"""
+
+    __slots__ = ("user_id", "job", "on_position", "position", "started", "sending", "update")
+
+    def __init__(self, user_id: int, job: DownloadJob, on_position: Optional[PositionCallback]):
+        self.user_id = user_id
+        self.job = job
+        self.on_position = on_position
+        self.position = 0
+        self.started = False
+        self.sending = False
+        self.update: Optional[asyncio.Task] = None
+
+
+class DownloadQueue:
+    """
+    Очередь заданий на скачивание с ограниченным числом обработчиков.
+    Ожидающим заданиям сообщается новая позиция по мере освобождения обработчиков.
+    """
+
+    def __init__(self, workers: int = DOWNLOAD_WORKERS, max_size: int = DOWNLOAD_QUEUE_SIZE,
+                 user_limit: int = DOWNLOAD_USER_LIMIT):
+        self.workers_count = workers
+        self.max_size = max_size
+        self.user_limit = user_limit
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._user_jobs: Dict[int, int] = defaultdict(int)
+        # Ожидающие задания в порядке очереди
+        self._waiting: Deque[_Entry] = deque()
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def start(self) -> None:
+        """Запуск обработчиков очереди (вызывается при запуске диспетчера)"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"download-worker-{i}")
+            for i in range(self.workers_count)
+        ]
+        logging.info(f"Очередь скачиваний запущена: {self.workers_count} обработчиков")
+
+    async def stop(self) -> None:
+        """Остановка обработчиков (вызывается при остановке диспетчера)"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        if self._queue is not None and not self._queue.empty():
+            logging.warning(f"Очередь скачиваний остановлена, не выполнено заданий: {self._queue.qsize()}")
+        self._queue = None
+        self._waiting.clear()
+
+    def submit(self, user_id: int, job: DownloadJob, on_position: Optional[PositionCallback] = None) -> int:
+        """
+        Постановка задания в очередь. Возвращает количество заданий перед ним
+        (0 - задание начнет выполняться сразу). Пока задание ждет, позиция передается
+        в on_position при каждом изменении, но не чаще раза в DOWNLOAD_PROGRESS_INTERVAL секунд.
+        """
+        if self._queue is None:
+            raise RuntimeError("Очередь скачиваний не запущена")
+
+        if self._user_jobs.get(user_id, 0) >= self.user_limit:
+            self.rejected += 1
+            raise UserDownloadLimit(f"Не более {self.user_limit} скачиваний одновременно")
+
+        entry = _Entry(user_id, job, on_position)
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise DownloadQueueFull("Очередь скачиваний переполнена")
+
+        self._user_jobs[user_id] += 1
+        self._waiting.append(entry)
+
+        idle_workers = len(self._workers) - self.active
+        entry.position = max(self._queue.qsize() - idle_workers, 0)
+        if entry.position:
+            self._schedule_report(entry)
+        return entry.position
+
+    def _report_positions(self) -> None:
+        """Пересчет позиций ожидающих заданий после освобождения обработчика"""
+        idle_workers = len(self._workers) - self.active
+        for index, entry in enumerate(self._waiting):
+            position = index + 1 - idle_workers
+            if position > 0 and position < entry.position:
+                entry.position = position
+                self._schedule_report(entry)
+
+    @staticmethod
+    def _schedule_report(entry: _Entry) -> None:
+        # Все обновления задания идут через одну задачу, поэтому сообщения не обгоняют друг друга
+        if entry.on_position is not None and (entry.update is None or entry.update.done()):
+            entry.update = asyncio.create_task(DownloadQueue._send_positions(entry))
+
+    @staticmethod
+    async def _send_positions(entry: _Entry) -> None:
+        while True:
+            sent = entry.position
+            entry.sending = True
+            try:
+                await entry.on_position(sent)
+            except Exception as e:
+                logging.warning(f"Не удалось обновить позицию в очереди скачиваний: {e}")
+            finally:
+                entry.sending = False
+
+            if entry.started:
+                return
+            # Изменения, пришедшие за интервал, объединяются в одно обновление
+            await asyncio.sleep(DOWNLOAD_PROGRESS_INTERVAL)
+            if entry.started or entry.position == sent:
+                return
+
+    async def _worker(self) -> None:
+        while True:
+            entry = await self._queue.get()
+            user_id = entry.user_id
+            # Очередь FIFO, поэтому выбранное задание - первое из ожидающих
+            self._waiting.popleft()
+            self.active += 1
+            self._report_positions()
+            try:
+                # Обновление позиции не должно перезаписать статус начавшегося скачивания
+                entry.started = True
+                if entry.update is not None:
+                    if entry.sending:
+                        await asyncio.gather(entry.update, return_exceptions=True)
+                    else:
+                        entry.update.cancel()
+                await entry.job()
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"Ошибка при выполнении задания на скачивание: {e}")
+            finally:
+                self.active -= 1
+                self._user_jobs[user_id] -= 1
+                if self._user_jobs[user_id] <= 0:
+                    del self._user_jobs[user_id]
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики очереди для админ-панели"""
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected
+        }
+
+
+download_queue = DownloadQueue()
@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+import aiofiles
+
+from config import FONT_MAX_DOWNLOAD_SIZE, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_PROGRESS_INTERVAL
+from services.http_session import http_session
+
+ProgressCallback = Callable[[int, Optional[int]], Awaitable[None]]
+
+
+class DownloadResult(NamedTuple):
+    """Результат скачивания: размер файла и его SHA-256"""
+    size: int
+    sha256: str
+
+
+class DownloadError(Exception):
+    """Ошибка скачивания файла"""
+
+
+class DownloadTooLarge(DownloadError):
+    """Файл превышает допустимый размер"""
+
+
+def format_size(size_bytes: int) -> str:
+    """Форматирование размера файла"""
+    if size_bytes < 1024:
+        return f"{size_bytes} байт"
+    elif size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.1f} КБ"
+    else:
+        return f"{size_bytes / (1024 * 1024):.1f} МБ"
+
+
+def status_progress(status_message, title: str) -> ProgressCallback:
+    """Колбэк прогресса, обновляющий сообщение о статусе скачивания"""
+    async def report(downloaded: int, total: Optional[int]) -> None:
+        if total:
+            progress = f"{format_size(downloaded)} из {format_size(total)} ({downloaded * 100 // total}%)"
+        else:
+            progress = format_size(downloaded)
+        await status_message.edit_text(f"{title}: {progress}")
+
+    return report
+
+
+async def download_to_file(
+    url: str,
+    file_path: str,
+    max_size: int = FONT_MAX_DOWNLOAD_SIZE,
+    on_progress: Optional[ProgressCallback] = None
+) -> DownloadResult:
+    """
+    Потоковое скачивание файла частями во временный файл с последующим
+    атомарным переименованием в file_path. Хеш содержимого считается на лету.
+    """
+    session = await http_session.get_session()
+    tmp_path = f"{file_path}.{uuid.uuid4().hex}.part"
+    downloaded = 0
+    digest = hashlib.sha256()
+
+    try:
+        async with session.get(url) as response:
+            if response.status != 200:
+                raise DownloadError(f"Сервер вернул статус {response.status}")
+
+            total = response.content_length
+            if total and total > max_size:
+                raise DownloadTooLarge(f"Размер файла {format_size(total)} превышает лимит")
+
+            last_report = time.monotonic()
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    downloaded += len(chunk)
+                    if downloaded > max_size:
+                        raise DownloadTooLarge(f"Размер файла превышает лимит {format_size(max_size)}")
+
+                    await f.write(chunk)
+                    digest.update(chunk)
+
+                    # Прогресс сообщаем не чаще раза в DOWNLOAD_PROGRESS_INTERVAL секунд
+                    now = time.monotonic()
+                    if on_progress and now - last_report >= DOWNLOAD_PROGRESS_INTERVAL:
+                        last_report = now
+                        try:
+                            await on_progress(downloaded, total)
+                        except Exception as e:
+                            logging.warning(f"Не удалось обновить прогресс скачивания: {e}")
+
+                await f.flush()
+                await asyncio.get_running_loop().run_in_executor(None, os.fsync, f.fileno())
+
+        if downloaded == 0:
+            raise DownloadError("Получен пустой файл")
+
+        os.replace(tmp_path, file_path)
+        logging.info(f"Файл скачан: {file_path}, размер: {downloaded} байт")
+        return DownloadResult(downloaded, digest.hexdigest())
+    except BaseException:
+        # Не оставляем недокачанные временные файлы
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        raise
@@ -1,15 +1,48 @@
-import aiohttp
-from config import FONT_API_URL
+from config import FONT_API_URL, FONT_API_SUGGESTIONS_LIMIT
+from services.http_session import http_session
+from services.search_cache import search_cache, normalize_query
+from services.font_result import parse_suggestions
+from utils.singleflight import SingleFlight
 
 class FontApiClient:
+    def __init__(self):
+        # Одновременные одинаковые запросы ждут один общий запрос к API
+        self._searches = SingleFlight()
+
     async def search_fonts(self, query):
         """
-        Поиск шрифтов по запросу через API
+        Поиск шрифтов по запросу через API (с кешированием результатов)
+        """
+        query_key = normalize_query(query)
+        
+        cached = await search_cache.get(query_key)
+        if cached is not None:
+            return cached
+        
+        return await self._searches.do(query_key, lambda: self._load_suggestions(query_key))
+
+    async def _load_suggestions(self, query_key):
+        """
+        Загрузка результатов из API и сохранение их в кеш
+        """
+        fetched = await self._fetch_suggestions(query_key)
+        if fetched is None:
+            return []
+        
+        results, received = fetched
+        # Ответ обрезан лимитом API - по нему нельзя отвечать на уточняющие запросы
+        await search_cache.set(query_key, results, truncated=received >= FONT_API_SUGGESTIONS_LIMIT)
+        return results
+
+    async def _fetch_suggestions(self, query):
+        """
+        Запрос к API автодополнения: результаты и количество подсказок в ответе;
+        None, если API вернуло ошибку. Ответ разбирается сразу в FontResult,
+        словари подсказок дальше не передаются
         """
-        async with aiohttp.ClientSession() as session:
-            params = {"query": query}
-            async with session.get(FONT_API_URL, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data.get("suggestions", [])
-                return [] 
\ No newline at end of file
+        session = await http_session.get_session()
+        params = {"query": query}
+        async with session.get(FONT_API_URL, params=params) as response:
+            if response.status == 200:
+                return parse_suggestions(await response.read())
+            return None
@@ -0,0 +1,33 @@
+import logging
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, Message
+
+
+async def send_by_file_id(message: Message, file_id: Optional[str], caption: str) -> bool:
+    """
+    Повторная отправка файла по сохраненному file_id Telegram (без загрузки файла).
+    Возвращает False, если file_id нет или Telegram его отклонил.
+    """
+    if not file_id:
+        return False
+
+    try:
+        await message.answer_document(file_id, caption=caption)
+        return True
+    except TelegramBadRequest as e:
+        logging.warning(f"Telegram отклонил сохраненный file_id: {e}. Отправляем файл заново.")
+        return False
+
+
+async def upload_font_document(message: Message, db, font_id: int, file_path: str,
+                               filename: str, caption: str) -> Optional[str]:
+    """Загрузка файла шрифта в Telegram с сохранением полученного file_id"""
+    sent = await message.answer_document(FSInputFile(file_path, filename=filename), caption=caption)
+
+    if not sent.document:
+        return None
+
+    await db.set_font_telegram_file_id(font_id, sent.document.file_id)
+    return sent.document.file_id
@@ -0,0 +1,93 @@
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from aiogram.types import Message
+
+from services.downloader import download_to_file, ProgressCallback
+from services.font_delivery import send_by_file_id, upload_font_document
+from services.font_store import font_store
+from utils.singleflight import SingleFlight
+
+
+class FontDownloadManager:
+    """
+    Скачивание и отправка шрифтов с объединением одновременных запросов одного slug:
+    архив скачивается один раз, а его file_id из первой отправки получают все ожидающие
+    """
+
+    def __init__(self):
+        self._downloads = SingleFlight()
+        self._uploads = SingleFlight()
+        self._listeners: Dict[str, List[ProgressCallback]] = defaultdict(list)
+
+    def is_downloading(self, font_slug: str) -> bool:
+        """Проверка, скачивается ли шрифт прямо сейчас"""
+        return font_slug in self._downloads
+
+    async def fetch(self, db, font_slug: str, download_url: str,
+                    on_progress: Optional[ProgressCallback] = None) -> Tuple[int, str]:
+        """
+        Скачивание архива шрифта в хранилище. Возвращает ID шрифта и путь к файлу.
+        Прогресс общего скачивания получают все присоединившиеся запросы.
+        """
+        if on_progress:
+            self._listeners[font_slug].append(on_progress)
+
+        try:
+            return await self._downloads.do(
+                font_slug, lambda: self._download(db, font_slug, download_url)
+            )
+        finally:
+            if on_progress:
+                self._listeners[font_slug].remove(on_progress)
+            if not self._listeners[font_slug]:
+                del self._listeners[font_slug]
+
+    async def _download(self, db, font_slug: str, download_url: str) -> Tuple[int, str]:
+        async def notify(downloaded: int, total: Optional[int]) -> None:
+            for listener in list(self._listeners.get(font_slug, ())):
+                try:
+                    await listener(downloaded, total)
+                except Exception as e:
+                    logging.warning(f"Не удалось обновить прогресс скачивания: {e}")
+
+        # Скачиваем файл частями и кладем архив в хранилище
+        tmp_path = font_store.temp_path(f"{font_slug}.zip")
+        result = await download_to_file(download_url, tmp_path, on_progress=notify)
+        _, file_path = await font_store.add_file(tmp_path, result.sha256)
+
+        # Привязываем файл к шрифту
+        font_id = await db.set_font_file(font_slug, file_path, result.sha256)
+        logging.info(f"Шрифт успешно скачан и сохранен: {file_path}")
+        return font_id, file_path
+
+    async def deliver(self, message: Message, db, font_id: int, font_slug: str,
+                      file_path: str, filename: str, caption: str) -> None:
+        """
+        Отправка файла шрифта. Первая из одновременных отправок загружает файл,
+        остальные ждут ее и отправляют полученный file_id.
+        """
+        is_first = False
+
+        async def upload() -> Optional[str]:
+            nonlocal is_first
+            is_first = True
+            return await upload_font_document(message, db, font_id, file_path, filename, caption)
+
+        try:
+            file_id = await self._uploads.do(font_slug, upload)
+        except Exception:
+            if is_first:
+                raise
+            # Ошибка чужой загрузки: отправляем файл самостоятельно
+            file_id = None
+
+        if is_first:
+            return
+
+        if not await send_by_file_id(message, file_id, caption):
+            await upload_font_document(message, db, font_id, file_path, filename, caption)
+
+
+font_downloads = FontDownloadManager()
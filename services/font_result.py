@@ -0,0 +1,80 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple, Union
+
+import orjson
+
+
+class FontResult(NamedTuple):
+    """
+    Шрифт в результатах поиска. Подсказки API разбираются один раз при получении ответа,
+    дальше по боту передаются компактные кортежи, а в кеш пишутся массивами без имен полей.
+    """
+
+    # Отображаемое название (поле value подсказки)
+    name: str
+    slug: str
+    font_name: str = ""
+    designer: str = ""
+    manufacturer: str = ""
+    user_fullname: str = ""
+    url: str = ""
+
+    @property
+    def download_url(self) -> str:
+        return f"https://font.download/dl/font/{self.slug}.zip"
+
+    @classmethod
+    def from_suggestion(cls, suggestion: Dict[str, Any]) -> "FontResult":
+        """Подсказка API автодополнения ({"value": ..., "data": {...}})"""
+        data = suggestion.get("data") or {}
+        font_name = data.get("font_name") or ""
+        return cls(
+            suggestion.get("value") or font_name or data.get("slug") or "",
+            data.get("slug") or "",
+            font_name,
+            data.get("designer") or "",
+            data.get("manufacturer") or "",
+            data.get("user_fullname") or "",
+            data.get("url") or ""
+        )
+
+    @classmethod
+    def from_font(cls, font: Dict[str, Any]) -> "FontResult":
+        """Шрифт локальной базы или запись found_fonts"""
+        font_name = font.get("font_name") or ""
+        return cls(
+            font_name or font.get("font_slug") or "",
+            font.get("font_slug") or "",
+            font_name,
+            font.get("designer") or "",
+            font.get("manufacturer") or "",
+            font.get("user_fullname") or "",
+            font.get("url") or ""
+        )
+
+    @classmethod
+    def from_cached(cls, item: Union[List[Any], Dict[str, Any]]) -> "FontResult":
+        """Элемент закешированного массива (словарь - запись кеша в прежнем формате)"""
+        if isinstance(item, dict):
+            return cls.from_suggestion(item)
+        return cls(*item)
+
+
+def parse_suggestions(payload: Union[bytes, str]) -> Tuple[List[FontResult], int]:
+    """
+    Разбор ответа API автодополнения: результаты и количество подсказок в ответе.
+    Подсказки без slug пропускаются, но учитываются в количестве (по нему определяется,
+    обрезан ли ответ лимитом API).
+    """
+    suggestions = orjson.loads(payload).get("suggestions") or []
+    results = [FontResult.from_suggestion(suggestion) for suggestion in suggestions]
+    return [result for result in results if result.slug], len(suggestions)
+
+
+def dump_results(results: Iterable[FontResult]) -> str:
+    """Сериализация результатов для кеша: массив массивов полей"""
+    return orjson.dumps([tuple(result) for result in results]).decode()
+
+
+def load_results(payload: Union[bytes, str]) -> List[FontResult]:
+    """Разбор результатов, сохраненных dump_results"""
+    return [FontResult.from_cached(item) for item in orjson.loads(payload)]
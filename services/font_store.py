@@ -0,0 +1,68 @@
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from typing import Optional, Tuple
+
+from config import FONTS_DIR
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Подсчет SHA-256 файла без чтения его целиком в память"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FontStore:
+    """
+    Контентно-адресуемое хранилище файлов шрифтов: каждый уникальный файл
+    хранится один раз под именем своего SHA-256 (blobs/ab/abcdef....zip)
+    """
+
+    def __init__(self, root: str = FONTS_DIR):
+        self.blobs_dir = os.path.join(root, "blobs")
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def temp_path(self, filename: str) -> str:
+        """Уникальный путь для временного файла внутри хранилища"""
+        return os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}_{os.path.basename(filename)}")
+
+    def blob_path(self, content_hash: str, ext: str = "") -> str:
+        """Путь к файлу в хранилище по его хешу"""
+        return os.path.join(self.blobs_dir, content_hash[:2], f"{content_hash}{ext}")
+
+    async def add_file(self, file_path: str, content_hash: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Перемещение файла в хранилище. Если такой файл уже есть, копия удаляется.
+        Возвращает хеш и путь к файлу в хранилище.
+        """
+        if content_hash is None:
+            loop = asyncio.get_running_loop()
+            content_hash = await loop.run_in_executor(None, file_sha256, file_path)
+
+        ext = os.path.splitext(file_path)[1].lower()
+        blob_path = self.blob_path(content_hash, ext)
+
+        if os.path.exists(blob_path):
+            os.remove(file_path)
+            logging.info(f"Файл {os.path.basename(file_path)} уже есть в хранилище: {blob_path}")
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(file_path, blob_path)
+            logging.info(f"Файл добавлен в хранилище: {blob_path}")
+
+        return content_hash, blob_path
+
+    @staticmethod
+    def is_available(file_path: Optional[str]) -> bool:
+        """Проверка, что файл существует и не пуст"""
+        return bool(file_path) and os.path.isfile(file_path) and os.path.getsize(file_path) > 0
+
+
+font_store = FontStore()
@@ -0,0 +1,114 @@
+"""
+Замер нечеткого поиска на синтетических названиях: время построения индекса и запроса,
+а также полнота - название с одной опечаткой (удаление, вставка, замена или перестановка
+соседних букв) должно находиться, если его сходство с исходным не ниже порога.
+
+Запуск: python -m services.fuzzy_benchmark --names 500000 --queries 500 --syllables 300
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from typing import List
+
+from services.fuzzy_index import TrigramIndex, trigrams
+
+_CONSONANTS = "bcdfghjklmnprstvwz"
+_VOWELS = "aeiouy"
+_SUFFIXES = ["", "", "", " Sans", " Serif", " Mono", " Pro", " Display", " Text", " Condensed", " Rounded"]
+
+
+def _synthetic_names(count: int, rng: random.Random, syllables_count: int) -> List[str]:
+    """
+    Названия из слогов: у таких названий много общих триграмм, как у настоящих шрифтов.
+    Чем меньше набор слогов, тем длиннее списки вхождений и медленнее поиск.
+    """
+    syllables = list(dict.fromkeys(
+        rng.choice(_CONSONANTS) + rng.choice(_VOWELS) + rng.choice(["", "", rng.choice(_CONSONANTS)])
+        for _ in range(syllables_count * 2)
+    ))[:syllables_count]
+    names = []
+    for _ in range(count):
+        word = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+        names.append(word.title() + rng.choice(_SUFFIXES))
+    return names
+
+
+def _typo(name: str, rng: random.Random) -> str:
+    """Одна опечатка в названии"""
+    position = rng.randrange(len(name))
+    kind = rng.randrange(4)
+    letter = rng.choice(string.ascii_lowercase)
+    if kind == 0 and len(name) > 1:
+        return name[:position] + name[position + 1:]
+    if kind == 1:
+        return name[:position] + letter + name[position:]
+    if kind == 2:
+        return name[:position] + letter + name[position + 1:]
+    if position < len(name) - 1:
+        return name[:position] + name[position + 1] + name[position] + name[position + 2:]
+    return name + letter
+
+
+def _jaccard(left: str, right: str) -> float:
+    left_grams, right_grams = trigrams(left), trigrams(right)
+    if not left_grams or not right_grams:
+        return 0.0
+    return len(left_grams & right_grams) / len(left_grams | right_grams)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Замер скорости и полноты нечеткого поиска")
+    parser.add_argument("--names", type=int, default=500000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--syllables", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = _synthetic_names(args.names, rng, args.syllables)
+
+    index = TrigramIndex()
+    started = time.perf_counter()
+    index.build(enumerate(names))
+    print(f"Индекс построен за {time.perf_counter() - started:.1f} с: {len(index)} названий")
+
+    timings = []
+    expected = found = 0
+    missed = []
+    for _ in range(args.queries):
+        font_id = rng.randrange(len(names))
+        query = _typo(names[font_id], rng)
+
+        started = time.perf_counter()
+        results = index.search(query, limit=args.limit)
+        timings.append((time.perf_counter() - started) * 1000)
+
+        similarity = _jaccard(query, names[font_id])
+        if similarity < index.min_similarity:
+            continue
+        expected += 1
+        # Исходное название найдено, если оно в результатах или все результаты не хуже него
+        # (одинаковые названия под разными ID равноценны)
+        if font_id in dict(results) or (len(results) == args.limit and results[-1][1] >= similarity - 1e-9):
+            found += 1
+        else:
+            missed.append((query, names[font_id], similarity))
+
+    timings.sort()
+    print(
+        f"Запрос: среднее {sum(timings) / len(timings):.2f} мс, "
+        f"медиана {timings[len(timings) // 2]:.2f} мс, 95% {timings[int(len(timings) * 0.95)]:.2f} мс"
+    )
+    print(f"Полнота на опечатках: найдено {found} из {expected}")
+    for query, name, similarity in missed[:10]:
+        print(f"  не найдено: '{query}' -> '{name}' (сходство {similarity:.2f})")
+
+    if missed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from config import FUZZY_MIN_SIMILARITY, FUZZY_RESULTS_LIMIT
+
+_EMPTY = array("I")
+# Список проверяется двоичным поиском по кандидатам, если он длиннее числа кандидатов в столько раз
+_PROBE_RATIO = 16
+# Порог первого прохода поиска
+_FIRST_PASS_SIMILARITY = 0.5
+
+
+def trigrams(text: str) -> Set[str]:
+    """Триграммы названия: каждое слово дополняется пробелами, как в pg_trgm ("  ro", " ro", "rob", ...)"""
+    grams = set()
+    for word in re.findall(r"[^\W_]+", text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    Инвертированный триграммный индекс названий шрифтов для поиска с опечатками.
+    Списки вхождений разбиты по числу триграмм названия (ключ - пара (триграмма, размер))
+    и хранятся в отсортированных array('I'), поэтому поиск читает только названия подходящего
+    размера. Удаление ленивое: удаленные ID отфильтровываются при поиске и вычищаются при уплотнении.
+    """
+
+    def __init__(self, min_similarity: float = FUZZY_MIN_SIMILARITY):
+        self.min_similarity = min_similarity
+        self._postings: Dict[Tuple[str, int], array] = {}
+        # Количество триграмм каждого названия (для меры Жаккара)
+        self._sizes: Dict[int, int] = {}
+        # Удаленные ID, которые еще остались в списках вхождений
+        self._deleted: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def build(self, fonts: Iterable[Tuple[int, str]]) -> None:
+        """Построение индекса с нуля по парам (ID, название)"""
+        started = time.perf_counter()
+        postings: Dict[Tuple[str, int], array] = {}
+        sizes: Dict[int, int] = {}
+
+        for font_id, name in sorted(fonts):
+            grams = trigrams(name or "")
+            if not grams:
+                continue
+            size = sizes[font_id] = len(grams)
+            for gram in grams:
+                posting = postings.get((gram, size))
+                if posting is None:
+                    posting = postings[(gram, size)] = array("I")
+                posting.append(font_id)
+
+        with self._lock:
+            self._postings = postings
+            self._sizes = sizes
+            self._deleted = set()
+
+        logging.info(
+            f"Индекс нечеткого поиска построен: {len(sizes)} названий, {len(postings)} списков вхождений "
+            f"за {time.perf_counter() - started:.2f} с"
+        )
+
+    def add(self, font_id: int, name: str) -> None:
+        """Добавление названия шрифта (уже проиндексированный ID пропускается)"""
+        grams = trigrams(name or "")
+        with self._lock:
+            if font_id in self._sizes or not grams:
+                return
+            # Старые вхождения удаленного ID засчитались бы новому названию
+            if font_id in self._deleted:
+                self._compact_locked()
+            size = self._sizes[font_id] = len(grams)
+            for gram in grams:
+                posting = self._postings.get((gram, size))
+                if posting is None:
+                    posting = self._postings[(gram, size)] = array("I")
+                # ID растут, поэтому обычно достаточно добавить в конец
+                if not posting or posting[-1] < font_id:
+                    posting.append(font_id)
+                else:
+                    position = bisect_left(posting, font_id)
+                    if position == len(posting) or posting[position] != font_id:
+                        posting.insert(position, font_id)
+
+    def remove(self, font_id: int) -> None:
+        """Удаление шрифта из индекса"""
+        with self._lock:
+            self._remove_locked(font_id)
+
+    def _remove_locked(self, font_id: int) -> None:
+        if self._sizes.pop(font_id, None) is None:
+            return
+        self._deleted.add(font_id)
+        # Уплотняем списки, когда удаленных записей становится много
+        if len(self._deleted) > max(1000, len(self._sizes) // 4):
+            self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        sizes = self._sizes
+        compacted = {}
+        for key, posting in self._postings.items():
+            size = key[1]
+            alive = array("I", (font_id for font_id in posting if sizes.get(font_id) == size))
+            if alive:
+                compacted[key] = alive
+        self._postings = compacted
+        self._deleted = set()
+
+    def search(self, query: str, limit: int = FUZZY_RESULTS_LIMIT) -> List[Tuple[int, float]]:
+        """
+        Поиск похожих названий. Возвращает пары (ID, сходство по Жаккару) по убыванию сходства:
+        точные limit лучших среди названий со сходством не ниже min_similarity.
+        Сначала ищутся названия со сходством не ниже _FIRST_PASS_SIMILARITY - это дешево,
+        и если их набралось limit, то более далекие не нужны. Иначе второй проход
+        с порогом min_similarity добавляет названия со сходством ниже первого порога.
+        """
+        query_grams = trigrams(query)
+        if not query_grams or limit <= 0:
+            return []
+
+        # Лучшие limit результатов: куча (сходство, -ID), наверху худший
+        best: List[Tuple[float, int]] = []
+        with self._lock:
+            first_floor = max(self.min_similarity, _FIRST_PASS_SIMILARITY)
+            self._search_locked(query_grams, first_floor, math.inf, best, limit)
+            if len(best) < limit and first_floor > self.min_similarity:
+                self._search_locked(query_grams, self.min_similarity, first_floor, best, limit)
+
+        return [(-font_id, similarity) for similarity, font_id in sorted(best, reverse=True)]
+
+    def _search_locked(
+        self, query_grams: Set[str], floor: float, ceiling: float,
+        best: List[Tuple[float, int]], limit: int
+    ) -> None:
+        """
+        Проход поиска: названия со сходством в [floor, ceiling) добавляются в кучу best.
+
+        Размеры названий перебираются по убыванию достижимого сходства min(|Q|, |S|) / max(|Q|, |S|),
+        перебор заканчивается, когда оно опускается ниже порога. Порог - floor, а когда набрано
+        limit результатов - сходство худшего из них. Для каждого размера действует точный
+        префиксный фильтр: название со сходством не ниже t разделяет с запросом хотя бы
+        o = ceil(t * (|Q| + |S|) / (1 + t)) триграмм и поэтому встречается в одном из
+        |Q| - o + 1 самых коротких списков этого размера. Кандидаты собираются из них,
+        а их вхождения в остальных списках досчитываются от коротких к длинным; после каждого
+        списка отбрасываются кандидаты, которым уже не набрать o.
+        """
+        query_size = len(query_grams)
+        min_size = max(math.ceil(floor * query_size - 1e-9), 1)
+        max_size = math.floor(query_size / floor + 1e-9) if floor > 0 else query_size * 10
+        candidate_sizes = sorted(
+            range(min_size, max_size + 1),
+            key=lambda size: min(query_size, size) / max(query_size, size),
+            reverse=True
+        )
+        sizes = self._sizes
+
+        for size in candidate_sizes:
+            threshold = max(floor, best[0][0]) if len(best) == limit else floor
+            if min(query_size, size) / max(query_size, size) < threshold - 1e-9:
+                break
+
+            min_overlap = max(math.ceil(threshold * (query_size + size) / (1 + threshold) - 1e-9), 1)
+            # Триграммы, которых нет в индексе, дают пустые списки и попадают в префикс первыми
+            postings = sorted((self._postings.get((gram, size), _EMPTY) for gram in query_grams), key=len)
+            split = query_size - min_overlap + 1
+
+            counts: Counter = Counter()
+            for posting in postings[:split]:
+                counts.update(posting)
+
+            rest = postings[split:]
+            for position, posting in enumerate(rest):
+                if not counts:
+                    break
+                if len(counts) * _PROBE_RATIO < len(posting):
+                    # Кандидатов мало, а список длинный - ищем каждого двоичным поиском
+                    length = len(posting)
+                    for font_id in counts:
+                        found = bisect_left(posting, font_id)
+                        if found < length and posting[found] == font_id:
+                            counts[font_id] += 1
+                else:
+                    # Проход по списку в C быстрее двоичного поиска для каждого кандидата
+                    counts.update(filter(counts.__contains__, posting))
+                needed = min_overlap - (len(rest) - position - 1)
+                if needed > 1 and min(counts.values()) < needed:
+                    counts = Counter({font_id: overlap for font_id, overlap in counts.items() if overlap >= needed})
+
+            for font_id, overlap in counts.most_common():
+                # Все кандидаты одного размера: сходство убывает вместе с пересечением
+                similarity = overlap / (query_size + size - overlap)
+                if similarity < floor or len(best) == limit and similarity <= best[0][0]:
+                    break
+                # Названия не ниже ceiling уже найдены предыдущим проходом
+                if similarity >= ceiling or sizes.get(font_id) != size:
+                    continue
+                if len(best) < limit:
+                    heapq.heappush(best, (similarity, -font_id))
+                else:
+                    heapq.heapreplace(best, (similarity, -font_id))
+
+    def on_font_changed(self, font_id: int, font_name: Optional[str]) -> None:
+        """Слушатель изменений локальной базы (font_name=None - шрифт удален)"""
+        if font_name is None:
+            self.remove(font_id)
+        else:
+            self.add(font_id, font_name)
+
+
+font_index = TrigramIndex()
+
+
+async def load_font_index(db) -> None:
+    """Построение индекса по локальной базе и подписка на ее изменения"""
+    await db.add_font_listener(font_index.on_font_changed)
+    fonts = await db.get_font_names()
+    await db.run(font_index.build, fonts)
+
+
+async def fuzzy_search_fonts(db, query: str, limit: int = FUZZY_RESULTS_LIMIT) -> List[Dict[str, Any]]:
+    """
+    Поиск шрифтов локальной базы с учетом опечаток.
+    Порядок: сходство триграмм, затем релевантность по названию, дизайнеру и производителю.
+    """
+    matches = font_index.search(query, limit)
+    if not matches:
+        return []
+
+    similarity = dict(matches)
+    fonts = await db.get_local_fonts_by_ids(list(similarity))
+
+    def rank(font: Dict[str, Any]) -> Tuple[float, float]:
+        relevance = db._calculate_relevance(
+            query, font.get("font_name") or "", font.get("designer"), font.get("manufacturer")
+        )
+        return -similarity[font["id"]], -relevance
+
+    fonts.sort(key=rank)
+    logging.info(f"Нечеткий поиск по запросу '{query}': найдено {len(fonts)} шрифтов")
+    return fonts
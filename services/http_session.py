@@ -0,0 +1,52 @@
+import logging
+from typing import Optional
+
+import aiohttp
+
+from config import (
+    HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+)
+
+
+class HttpSessionManager:
+    """Общая HTTP-сессия с пулом keep-alive соединений на весь процесс"""
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> aiohttp.ClientSession:
+        """Открытие сессии (вызывается при запуске диспетчера)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_LIMIT,
+                limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+            )
+            # Общий таймаут не задаем: архивы шрифтов могут скачиваться долго,
+            # зависшие соединения отсекаются таймаутом чтения
+            timeout = aiohttp.ClientTimeout(
+                total=None,
+                connect=HTTP_CONNECT_TIMEOUT,
+                sock_read=HTTP_READ_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            logging.info("HTTP-сессия открыта")
+        return self._session
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Получение общей сессии (открывается при первом обращении)"""
+        if self._session is None or self._session.closed:
+            return await self.start()
+        return self._session
+
+    async def close(self) -> None:
+        """Закрытие сессии (вызывается при остановке диспетчера)"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+            logging.info("HTTP-сессия закрыта")
+        self._session = None
+
+
+http_session = HttpSessionManager()
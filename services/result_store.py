@@ -0,0 +1,77 @@
+import logging
+from typing import Dict, List, Optional
+
+from config import RESULT_STORE_SIZE, RESULT_STORE_IDLE_TTL
+from services.font_result import FontResult
+from utils.lru_cache import LRUCache
+from utils.pagination import paginate_results
+
+
+class ResultSet:
+    """Результаты одного поиска с индексом по slug"""
+
+    __slots__ = ("query", "results", "is_fuzzy", "_by_slug")
+
+    def __init__(self, query: str, results: List[FontResult], is_fuzzy: bool = False):
+        self.query = query
+        self.results = results
+        self.is_fuzzy = is_fuzzy
+        # При повторе slug берется первый результат
+        self._by_slug: Dict[str, int] = {}
+        for index, result in enumerate(results):
+            self._by_slug.setdefault(result.slug, index)
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def page(self, page: int) -> List[FontResult]:
+        """Результаты страницы (страницы нумеруются с 1)"""
+        return paginate_results(self.results, page)
+
+    def get_font(self, font_slug: str) -> Optional[FontResult]:
+        """Результат по slug шрифта"""
+        index = self._by_slug.get(font_slug)
+        return None if index is None else self.results[index]
+
+
+class ResultStore:
+    """
+    Общий кеш результатов поиска по search_id. В состоянии FSM пользователя хранится
+    только ID поиска и страница; записи вытесняются по размеру и времени простоя,
+    а вытесненные результаты восстанавливаются из таблицы found_fonts.
+    """
+
+    def __init__(self, maxsize: int = RESULT_STORE_SIZE, idle_ttl: float = RESULT_STORE_IDLE_TTL):
+        self._sets = LRUCache(maxsize=maxsize, ttl=idle_ttl, sliding=True)
+        self.db_loads = 0
+
+    def put(self, search_id: int, query: str, results: List[FontResult], is_fuzzy: bool = False) -> ResultSet:
+        """Сохранение результатов нового поиска"""
+        result_set = ResultSet(query, results, is_fuzzy)
+        self._sets.set(search_id, result_set)
+        return result_set
+
+    async def get(self, db, search_id: Optional[int]) -> Optional[ResultSet]:
+        """Результаты поиска из кеша или из базы данных"""
+        if search_id is None:
+            return None
+
+        result_set = self._sets.get(search_id)
+        if result_set is not None:
+            return result_set
+
+        details = await db.get_search_details(search_id)
+        if not details:
+            return None
+
+        self.db_loads += 1
+        logging.info(f"Результаты поиска {search_id} восстановлены из базы данных")
+        results = [FontResult.from_font(font) for font in details["fonts"]]
+        return self.put(search_id, details["query"], results, details["is_fuzzy"])
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики кеша результатов"""
+        return {**self._sets.stats(), "db_loads": self.db_loads}
+
+
+result_store = ResultStore()
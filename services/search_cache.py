@@ -0,0 +1,132 @@
+import logging
+import time
+from typing import Dict, List, Optional
+
+from config import SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, SEARCH_CACHE_PURGE_INTERVAL, SEARCH_PREFIX_MIN_LENGTH
+from services.font_result import FontResult, dump_results, load_results
+from utils.lru_cache import LRUCache
+
+
+def normalize_query(query: str) -> str:
+    """Нормализация запроса для использования в качестве ключа кеша"""
+    return " ".join(query.lower().split())
+
+
+def _matches(result: FontResult, query_key: str) -> bool:
+    """Проверка, подходит ли подсказка под уточненный запрос"""
+    return query_key in normalize_query(result.name) or query_key in normalize_query(result.font_name)
+
+
+class SearchCache:
+    """
+    Двухуровневый кеш результатов автодополнения: LRU в памяти + таблица SQLite.
+    Вместе с результатами хранится признак того, что ответ API был обрезан лимитом.
+    """
+
+    def __init__(self, maxsize: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL,
+                 purge_interval: float = SEARCH_CACHE_PURGE_INTERVAL):
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._last_purge = time.monotonic()
+        self._memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._db = None
+        self.db_hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+
+    def bind(self, db) -> None:
+        """Подключение постоянного уровня кеша (асинхронная база данных)"""
+        self._db = db
+
+    async def purge(self) -> None:
+        """Очистка устаревших записей постоянного уровня кеша"""
+        if self._db is None:
+            return
+        self._last_purge = time.monotonic()
+        try:
+            removed = await self._db.purge_search_cache(self.ttl)
+        except Exception as e:
+            logging.error(f"Ошибка при очистке кеша поиска: {e}")
+            return
+        if removed:
+            logging.info(f"Удалено {removed} устаревших записей кеша поиска")
+
+    async def get(self, query_key: str) -> Optional[List[FontResult]]:
+        """Получение результатов по нормализованному запросу"""
+        entry = self._memory.get(query_key)
+        if entry is not None:
+            return entry[0]
+
+        if self._db is not None:
+            try:
+                cached = await self._db.get_cached_search(query_key, self.ttl)
+            except Exception as e:
+                logging.error(f"Ошибка при чтении кеша поиска: {e}")
+                cached = None
+
+            if cached is not None:
+                payload, age, truncated = cached
+                results = load_results(payload)
+                # Поднимаем запись в память с оставшимся временем жизни
+                self._memory.set(query_key, (results, truncated), ttl=self.ttl - age)
+                self.db_hits += 1
+                return results
+
+        results = self._refine_from_prefix(query_key)
+        if results is not None:
+            # Отфильтрованный полный ответ тоже полный
+            self._memory.set(query_key, (results, False))
+            self.prefix_hits += 1
+            return results
+
+        self.misses += 1
+        return None
+
+    def _refine_from_prefix(self, query_key: str) -> Optional[List[FontResult]]:
+        """
+        Ответ на уточняющий запрос ("rob" -> "robo") фильтрацией результатов
+        более короткого префикса. Возможен, только если результаты префикса
+        не были обрезаны лимитом API.
+        """
+        for length in range(len(query_key) - 1, SEARCH_PREFIX_MIN_LENGTH - 1, -1):
+            parent = self._memory.peek(query_key[:length])
+            if parent is None:
+                continue
+
+            # Самый длинный закешированный префикс обрезан - более короткие тоже
+            parent_results, truncated = parent
+            if truncated:
+                return None
+
+            return [result for result in parent_results if _matches(result, query_key)]
+
+        return None
+
+    async def set(self, query_key: str, results: List[FontResult], truncated: bool = True) -> None:
+        """Сохранение результатов в оба уровня кеша (truncated - ответ API обрезан лимитом)"""
+        self._memory.set(query_key, (results, truncated))
+
+        if self._db is not None:
+            try:
+                await self._db.set_cached_search(query_key, dump_results(results), truncated)
+            except Exception as e:
+                logging.error(f"Ошибка при записи кеша поиска: {e}")
+
+            # Каждый новый запрос добавляет строку в таблицу - периодически удаляем устаревшие
+            if time.monotonic() - self._last_purge >= self.purge_interval:
+                await self.purge()
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики кеша для админ-панели"""
+        memory_stats = self._memory.stats()
+        return {
+            "size": memory_stats["size"],
+            "memory_hits": memory_stats["hits"],
+            "db_hits": self.db_hits,
+            "prefix_hits": self.prefix_hits,
+            "misses": self.misses,
+            "evictions": memory_stats["evictions"]
+        }
+
+
+search_cache = SearchCache()